@@ -1,70 +1,574 @@
-import cv2
+import argparse
+import json
 import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import cv2
+import numpy as np
 
 # === 配置区域：改成你自己的路径 ===
-video_dir = r"G:\2023.11.10"      # 存放多个视频的文件夹
+video_dirs = [r"G:\2023.11.10"]         # 存放视频的文件夹，可以一次放多个（比如 D01~D09 的几天）
 output_root_dir = r"F:\dataset\train"  # 所有图片输出的总文件夹
 interval_sec = 120                       # 每多少秒保存一帧
+extract_mode = "seek"                    # "seek" 跳转到目标帧 / "grab" 只解码保留帧 / "read" 逐帧读取（旧方式）
+num_workers = os.cpu_count() or 1        # 同时处理几个视频（每个进程各自打开一个 VideoCapture）
+
+# 画面变化自适应抽帧：设为 None 就是普通的固定间隔抽帧
+# 开启后每隔 interval_sec 检查一帧，只有和上一张保存的图差异 >= scene_threshold 才保存，
+# 但距离上一张超过 max_interval_sec 时无论如何都保存一张
+scene_threshold = None                   # 缩略图平均灰度差 (0~255)，建议 4~10
+max_interval_sec = 600
+
+# 同一次解码再多输出几组不同间隔的图片（每组一个输出文件夹），比如给跟踪数据用的密集帧：
+# extra_specs = [{"output_root": r"F:\Trackdata\frames", "interval_sec": 3}]
+extra_specs = []
+
+# 图片输出格式："jpg" / "png" / "webp"
+image_format = "jpg"
+jpeg_quality = 95                        # jpg / webp 质量 (0~100)
+png_compression = 3                      # png 压缩级别 (0~9)，越大越小越慢
+writer_threads = 4                       # 每个视频后台编码+写盘的线程数
 # ==================================
 
-os.makedirs(output_root_dir, exist_ok=True)
+# 两个保留帧之间相隔少于这么多帧时，跳转（回到关键帧再解码）不一定比顺序 grab 快
+SEEK_MIN_GAP = 250
+
+VIDEO_EXTS = (".mp4", ".avi", ".mov", ".mkv")
+
+# 输出总文件夹里记录所有已完成视频的清单；每个视频输出文件夹里的进度文件记录处理到哪一帧
+MANIFEST_NAME = "extract_manifest.json"
+PROGRESS_NAME = ".extract_progress.json"
+# 进度文件最多每隔几秒写一次；崩溃时最多重抽这几秒内保存的图片（文件名相同，直接覆盖）
+PROGRESS_SAVE_SEC = 5.0
+
+# 比较画面变化用的缩略图边长
+SCENE_THUMB_SIZE = 32
+
+# 每个写盘线程最多积压几帧没写完，解码比写盘快时让解码线程等一等，避免内存暴涨
+WRITER_QUEUE_PER_THREAD = 4
+# 进度输出间隔（秒），不再每张图打印一行
+PRINT_EVERY_SEC = 2.0
+
+
+def make_spec(output_root, interval_sec, scene_threshold=None, max_interval_sec=None):
+    """一组采样参数：输出到 output_root，每 interval_sec 一帧（可选按画面变化）"""
+    return {
+        "output_root": output_root,
+        "interval_sec": interval_sec,
+        "scene_threshold": scene_threshold,
+        "max_interval_sec": max_interval_sec if scene_threshold is not None else None,
+    }
+
+
+def _video_identity(video_path, spec):
+    """用来判断视频是否变过：路径 + 大小 + 修改时间 + 抽帧参数"""
+    st = os.stat(video_path)
+    return {
+        "path": os.path.abspath(video_path),
+        "size": st.st_size,
+        "mtime": st.st_mtime,
+        "interval_sec": spec["interval_sec"],
+        "scene_threshold": spec["scene_threshold"],
+        "max_interval_sec": spec["max_interval_sec"],
+    }
+
+
+def _same_video(record, identity):
+    return record is not None and all(record.get(k) == v for k, v in identity.items())
+
+
+def _load_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _dump_json(data, path):
+    """先写临时文件再替换，中途崩溃也不会留下写了一半的 json"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_manifest(output_root_dir):
+    """读取输出总文件夹的清单 {视频绝对路径: 记录}"""
+    manifest = _load_json(os.path.join(output_root_dir, MANIFEST_NAME))
+    return manifest if isinstance(manifest, dict) else {}
+
+
+def save_manifest(manifest, output_root_dir):
+    _dump_json(manifest, os.path.join(output_root_dir, MANIFEST_NAME))
+
+
+def encode_params(fmt=None, quality=None):
+    """图片格式对应的扩展名和 cv2.imencode 参数"""
+    fmt = (fmt or image_format).lower().lstrip(".")
+    quality = jpeg_quality if quality is None else quality
+    if fmt in ("jpg", "jpeg"):
+        return ".jpg", [cv2.IMWRITE_JPEG_QUALITY, quality]
+    if fmt == "png":
+        return ".png", [cv2.IMWRITE_PNG_COMPRESSION, png_compression]
+    if fmt == "webp":
+        return ".webp", [cv2.IMWRITE_WEBP_QUALITY, quality]
+    raise ValueError(f"不支持的图片格式：{fmt}")
+
+
+class FrameWriter:
+    """
+    后台编码+写盘：解码线程只负责 submit，imencode 和写文件交给线程池。
+    积压的帧数有上限（有界队列），满了 submit 会等待。
+    """
+
+    def __init__(self, threads=None, fmt=None, quality=None):
+        threads = max(1, threads or writer_threads)
+        self.ext, self.params = encode_params(fmt, quality)
+        self._pool = ThreadPoolExecutor(max_workers=threads)
+        self._slots = threading.BoundedSemaphore(threads * WRITER_QUEUE_PER_THREAD)
+        self._pending = []
+        self.failed = []
+
+    def _write(self, frame, save_path):
+        """编码并写盘，成功返回 None，失败返回原因（不往外抛，免得一帧出错把整个抽帧进程带崩）"""
+        try:
+            ok, buf = cv2.imencode(self.ext, frame, self.params)
+            if not ok:
+                return "imencode 失败"
+            # 用 Python 写文件，Windows 中文路径下 cv2.imwrite 会失败
+            with open(save_path, "wb") as f:
+                f.write(buf.tobytes())
+            return None
+        except (OSError, cv2.error) as e:
+            # cv2.error：格式和质量参数不匹配等编码错误
+            return " ".join(str(e).split())
+        finally:
+            self._slots.release()
+
+    def submit(self, frame, save_path):
+        self._slots.acquire()
+        self._pending.append((save_path, self._pool.submit(self._write, frame, save_path)))
+
+    def wait(self):
+        """等已提交的帧全部写完，返回这一批写失败的路径"""
+        failed = []
+        for path, future in self._pending:
+            error = future.result()
+            if error is not None:
+                print(f"保存失败：{path}（{error}）", flush=True)
+                failed.append(path)
+        self._pending = []
+        self.failed.extend(failed)
+        return failed
+
+    def close(self):
+        self.wait()
+        self._pool.shutdown()
+
+
+def scene_thumb(frame):
+    """缩小成灰度小图，用来便宜地比较两帧画面差了多少"""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    thumb = cv2.resize(gray, (SCENE_THUMB_SIZE, SCENE_THUMB_SIZE), interpolation=cv2.INTER_AREA)
+    return thumb.astype(np.int16)
+
+
+def scene_diff(thumb1, thumb2):
+    """两张缩略图的平均绝对灰度差 (0~255)"""
+    return float(np.abs(thumb1 - thumb2).mean())
+
+
+def _seek_accurate(cap, target_idx, fps):
+    """跳转到 target_idx 并读出该帧；时间戳对不上时返回 None（说明这个容器跳转不准）"""
+    if not cap.set(cv2.CAP_PROP_POS_FRAMES, target_idx):
+        return None
+    ret, frame = cap.read()
+    if not ret:
+        return None
+    # 读完一帧后 POS_MSEC 是刚读出那一帧的时间戳，误差超过半帧就认为跳转不准
+    expected_msec = target_idx * 1000.0 / fps
+    if abs(cap.get(cv2.CAP_PROP_POS_MSEC) - expected_msec) > 500.0 / fps:
+        return None
+    return frame
+
 
+class _SpecSampler:
+    """一个视频在一组采样参数下的抽帧状态（进度、编号、上一张的缩略图）"""
 
-def extract_frames_from_video(video_path, output_dir, interval_sec):
-    os.makedirs(output_dir, exist_ok=True)
-    print("当前视频输出文件夹：", os.path.abspath(output_dir), flush=True)
+    def __init__(self, video_path, output_dir, spec, fps, resume, writer):
+        self.video_path = video_path
+        self.writer = writer
+        self.output_dir = output_dir
+        self.scene_threshold = spec["scene_threshold"]
+        self.resume = resume
+        self.frame_interval = max(int(fps * spec["interval_sec"]), 1)
+        self.max_gap = int(fps * spec["max_interval_sec"]) if spec["max_interval_sec"] else None
+        self.skipped_similar = 0
+        # 有图片写失败后这组参数不再往下抽（进度停在失败的帧之前，续跑时从那里重新开始）
+        self.stopped = False
+        self.last_dump = time.time()
+        self.last_print = time.time()
 
+        os.makedirs(output_dir, exist_ok=True)
+        print("当前视频输出文件夹：", os.path.abspath(output_dir), flush=True)
+
+        identity = _video_identity(video_path, spec)
+        self.progress_path = os.path.join(output_dir, PROGRESS_NAME)
+        # frames 记录每张图片对应源视频的帧号，配合 video_index.get_frames 可以回到视频里取相邻帧
+        self.progress = dict(identity, fps=fps, last_frame=-1, files=[], frames={}, next_index=0, done=False)
+        if resume:
+            old = _load_json(self.progress_path)
+            if _same_video(old, identity):
+                self.progress = old
+                old.setdefault("next_index", len(old["files"]))
+                old.setdefault("frames", {})
+                if old["done"]:
+                    print(f"视频 {os.path.basename(video_path)} 之前已完成，跳过 -> {output_dir}", flush=True)
+                elif old["last_frame"] >= 0:
+                    print(f"{os.path.basename(video_path)} 从第 {old['last_frame'] + 1} 帧继续", flush=True)
+
+        # 从上次保存的帧之后开始，编号接着已有的图片往下排
+        self.start_frame = self.progress["last_frame"] + 1
+
+        # 自适应抽帧：记住上一张保存图的缩略图，续跑时从磁盘读回来
+        self.last_thumb = None
+        if self.scene_threshold is not None and self.progress["files"]:
+            last_img = cv2.imread(os.path.join(output_dir, self.progress["files"][-1]), cv2.IMREAD_GRAYSCALE)
+            if last_img is not None:
+                self.last_thumb = scene_thumb(last_img)
+
+    @property
+    def done(self):
+        return self.progress["done"]
+
+    @property
+    def saved_count(self):
+        return len(self.progress["files"])
+
+    def targets(self, frame_count):
+        """这组参数需要检查的帧号"""
+        if self.done:
+            return range(0)
+        first = -(-self.start_frame // self.frame_interval) * self.frame_interval
+        return range(first, frame_count, self.frame_interval)
+
+    def wants(self, frame_idx):
+        return (not self.done and not self.stopped
+                and frame_idx >= self.start_frame and frame_idx % self.frame_interval == 0)
+
+    def consider(self, frame, frame_idx):
+        """候选帧：决定要不要写盘"""
+        if self.scene_threshold is not None:
+            thumb = scene_thumb(frame)
+            forced = self.max_gap is not None and frame_idx - self.progress["last_frame"] >= self.max_gap
+            if self.last_thumb is not None and not forced and scene_diff(thumb, self.last_thumb) < self.scene_threshold:
+                self.skipped_similar += 1
+                return
+            self.last_thumb = thumb
+        file_name = f"frame_{self.progress['next_index']:05d}{self.writer.ext}"
+        self.writer.submit(frame, os.path.join(self.output_dir, file_name))
+        self.progress["next_index"] += 1
+        self.progress["files"].append(file_name)
+        self.progress["frames"][file_name] = frame_idx
+        self.progress["last_frame"] = frame_idx
+
+        now = time.time()
+        if now - self.last_print >= PRINT_EVERY_SEC:
+            print(f"{os.path.basename(self.video_path)} 已保存 {self.saved_count} 张 "
+                  f"(当前帧: {frame_idx}) -> {self.output_dir}", flush=True)
+            self.last_print = now
+        if self.resume and now - self.last_dump >= PROGRESS_SAVE_SEC:
+            self._sync_written()
+            _dump_json(self.progress, self.progress_path)
+            self.last_dump = time.time()
+
+    def _sync_written(self):
+        """
+        等后台写完，保证进度里记录的图片都已经落盘。
+        有图片写失败时，进度退回到第一张失败的帧之前：last_frame 不越过失败的帧，
+        之后已经写好的图片也删掉（续跑会重新抽，免得编号重复），这组参数不再往下抽。
+        """
+        self.writer.wait()
+        failed = set(self.writer.failed)
+        files = self.progress["files"]
+        bad = [i for i, f in enumerate(files) if os.path.join(self.output_dir, f) in failed]
+        if not bad:
+            return
+        cut = bad[0]
+        for f in files[cut:]:
+            try:
+                os.remove(os.path.join(self.output_dir, f))
+            except OSError:
+                pass
+        first_failed = files[cut]
+        self.progress["last_frame"] = self.progress["frames"][first_failed] - 1
+        self.progress["next_index"] = int(os.path.splitext(first_failed)[0].rsplit("_", 1)[-1])
+        self.progress["files"] = files[:cut]
+        self.progress["frames"] = {f: self.progress["frames"][f] for f in files[:cut]}
+        self.stopped = True
+
+    def finish(self):
+        if self.done:
+            return
+        self._sync_written()
+        if self.stopped:
+            if self.resume:
+                _dump_json(self.progress, self.progress_path)
+            print(f"视频 {os.path.basename(self.video_path)} 有图片保存失败，停在第 {self.progress['last_frame'] + 1} 帧，"
+                  f"已保存 {self.saved_count} 张到：{self.output_dir}（问题解决后续跑会从这一帧继续）", flush=True)
+            return
+        self.progress["done"] = True
+        if self.resume:
+            _dump_json(self.progress, self.progress_path)
+        print(f"视频 {os.path.basename(self.video_path)} 完成，保存 {self.saved_count} 张图片到：{self.output_dir}")
+        if self.scene_threshold is not None:
+            print(f"  画面变化不足而跳过 {self.skipped_similar} 张", flush=True)
+
+
+def _decode_wanted(cap, video_path, fps, mode, targets, wants, start_frame=0):
+    """
+    按需解码的生成器，产出 (帧号, 图片)，结束时释放 cap。
+    mode="seek" 时依次跳到 targets 里的帧号；跳转不准就重新打开视频退回 "grab"，
+    "grab"/"read" 模式从 start_frame 开始顺序读，只有 wants(帧号) 为真的帧才解码。
+    """
+    frame_idx = 0
+    try:
+        if mode == "seek":
+            for target_idx in targets:
+                frame = _seek_accurate(cap, target_idx, fps)
+                if frame is None:
+                    print(f"{os.path.basename(video_path)} 跳转不准确，改为顺序读取 (从第 {target_idx} 帧开始)", flush=True)
+                    # 重新打开视频，从头顺序 grab 到 target_idx，后面按 grab 模式继续
+                    cap.release()
+                    cap = cv2.VideoCapture(video_path)
+                    mode = "grab"
+                    while frame_idx < target_idx and cap.grab():
+                        frame_idx += 1
+                    break
+                yield target_idx, frame
+
+        if mode in ("grab", "read"):
+            # 顺序模式续跑时先空 grab 到起始帧
+            while frame_idx < start_frame and cap.grab():
+                frame_idx += 1
+            while True:
+                wanted = wants(frame_idx)
+                if mode == "read":
+                    ret, frame = cap.read()
+                else:
+                    ret = cap.grab()
+                    if ret and wanted:
+                        ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                if wanted:
+                    yield frame_idx, frame
+                frame_idx += 1
+    finally:
+        cap.release()
+
+
+def _open_video(video_path):
+    """打开视频，返回 (cap, fps, 总帧数)；打不开返回 None"""
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         print(f"无法打开视频：{video_path}")
-        return 0
+        return None
 
     fps = cap.get(cv2.CAP_PROP_FPS)
     if fps <= 0:
         # 部分视频可能读不到 fps，给一个默认值
         fps = 25.0
+    return cap, fps, int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
 
-    frame_interval = int(fps * interval_sec)
-    if frame_interval <= 0:
-        frame_interval = 1
 
-    frame_idx = 0
-    saved_count = 0
+def iter_video_frames(video_path, interval_sec, mode="seek"):
+    """按固定时间间隔逐帧产出 (帧号, 图片)，不写盘，给 pipeline 等流式处理用"""
+    opened = _open_video(video_path)
+    if opened is None:
+        return
+    cap, fps, frame_count = opened
+    frame_interval = max(int(fps * interval_sec), 1)
+    if mode == "seek" and (frame_count <= 0 or frame_interval < SEEK_MIN_GAP):
+        mode = "grab"
+    targets = range(0, max(frame_count, 0), frame_interval)
+    yield from _decode_wanted(cap, video_path, fps, mode, targets, lambda idx: idx % frame_interval == 0)
+
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
+def extract_frames_multi(video_path, outputs, mode="seek", resume=True, fmt=None, quality=None):
+    """
+    一次解码同时按多组参数抽帧。outputs 是 [(输出文件夹, spec), ...]，spec 由 make_spec 生成，
+    返回每组保存的张数。每一帧只解码一次，需要的参数组各自决定是否写到自己的文件夹。
+    mode="seek": 直接跳到目标帧，只解码需要检查的帧；跳转不准时自动退回 "grab"
+    mode="grab": 顺序 grab() 跳过不需要的帧，只对需要的帧做 retrieve()（解码+颜色转换）
+    mode="read": 逐帧 read()，最慢但兼容性最好
+    resume=True 时把进度写进各输出文件夹的进度文件，下次从上次停下的帧继续
+    fmt / quality 为输出图片格式和质量，不填用配置区域的 image_format / jpeg_quality
+    """
+    opened = _open_video(video_path)
+    if opened is None:
+        return [0] * len(outputs)
+    cap, fps, frame_count = opened
+
+    writer = FrameWriter(fmt=fmt, quality=quality)
+    samplers = [_SpecSampler(video_path, output_dir, spec, fps, resume, writer) for output_dir, spec in outputs]
+    pending = [s for s in samplers if not s.done]
+    if not pending:
+        cap.release()
+        writer.close()
+        return [s.saved_count for s in samplers]
+
+    if mode == "seek" and (frame_count <= 0 or min(s.frame_interval for s in pending) < SEEK_MIN_GAP):
+        # 读不到总帧数，或者间隔太小，跳转没有好处
+        mode = "grab"
+
+    targets = sorted(set().union(*(s.targets(frame_count) for s in pending))) if mode == "seek" else []
+    start_frame = min(s.start_frame for s in pending)
+    for frame_idx, frame in _decode_wanted(cap, video_path, fps, mode, targets,
+                                           lambda idx: any(s.wants(idx) for s in pending), start_frame):
+        for s in pending:
+            if s.wants(frame_idx):
+                s.consider(frame, frame_idx)
+        if all(s.stopped for s in pending):
+            # 所有参数组都因为写失败停下了，不用再解码
             break
 
-        # 每隔 frame_interval 帧保存一张图片
-        if frame_idx % frame_interval == 0:
-            save_path = os.path.join(output_dir, f"frame_{saved_count:05d}.jpg")
-            ok = cv2.imwrite(save_path, frame)
-            if ok:
-                saved_count += 1
-                print(
-                    f"{os.path.basename(video_path)} 已保存第 {saved_count} 张图片 "
-                    f"(当前帧: {frame_idx}) -> {save_path}",
-                    flush=True
-                )
-            else:
-                print("保存失败：", save_path, flush=True)
-
-        frame_idx += 1
+    for s in pending:
+        s.finish()
+    writer.close()
+    return [s.saved_count for s in samplers]
+
+
+def extract_frames_from_video(video_path, output_dir, interval_sec, mode="seek", resume=True,
+                              scene_threshold=None, max_interval_sec=None):
+    """
+    按固定时间间隔抽帧（只有一组参数时的 extract_frames_multi）。
+    scene_threshold 不为 None 时按画面变化抽帧：每 interval_sec 检查一帧，与上一张保存的图
+    差异小于阈值就不写盘，直到距离上一张超过 max_interval_sec（None 表示不强制）
+    """
+    spec = make_spec(None, interval_sec, scene_threshold, max_interval_sec)
+    return extract_frames_multi(video_path, [(output_dir, spec)], mode, resume)[0]
+
+
+def list_videos(video_dirs):
+    """收集所有输入文件夹里的视频，按文件名排序"""
+    videos = []
+    for video_dir in video_dirs:
+        if not os.path.isdir(video_dir):
+            print(f"跳过，文件夹不存在：{video_dir}")
+            continue
+        for filename in sorted(os.listdir(video_dir)):
+            if filename.lower().endswith(VIDEO_EXTS):
+                videos.append(os.path.join(video_dir, filename))
+    return videos
+
+
+def _video_output_dir(video_path, output_root_dir):
+    name, _ = os.path.splitext(os.path.basename(video_path))
+    return os.path.join(output_root_dir, name)
+
 
+def _extract_worker(video_path, specs, mode, fmt, quality):
+    """子进程入口：处理一个视频，返回 (视频路径, 各组保存张数, 视频总帧数, 耗时秒, 各组清单记录)"""
+    start = time.time()
+    output_dirs = [_video_output_dir(video_path, spec["output_root"]) for spec in specs]
+    saved = extract_frames_multi(video_path, list(zip(output_dirs, specs)), mode, fmt=fmt, quality=quality)
+    records = [_load_json(os.path.join(d, PROGRESS_NAME)) for d in output_dirs]
+
+    cap = cv2.VideoCapture(video_path)
+    frame_count = max(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), 0)
     cap.release()
-    print(f"视频 {os.path.basename(video_path)} 完成，保存 {saved_count} 张图片到：{output_dir}")
-    return saved_count
+    return video_path, saved, frame_count, time.time() - start, records
+
+
+def extract_all(video_dirs, specs, mode="seek", num_workers=1, fmt=None, quality=None):
+    """
+    把多个文件夹里的视频分给进程池并行抽帧，返回这些视频的总保存张数。
+    specs 是 make_spec 生成的多组采样参数，每个视频只解码一次，同时写到各组的输出文件夹。
+    每组输出文件夹有自己的清单；清单里已经完成、且大小/修改时间/抽帧参数都没变的直接跳过。
+    """
+    manifests = []
+    for spec in specs:
+        os.makedirs(spec["output_root"], exist_ok=True)
+        manifests.append(load_manifest(spec["output_root"]))
+
+    jobs = []
+    skipped = 0
+    for video_path in list_videos(video_dirs):
+        pending = []
+        for i, (spec, manifest) in enumerate(zip(specs, manifests)):
+            record = manifest.get(os.path.abspath(video_path))
+            if not (record and record.get("done") and _same_video(record, _video_identity(video_path, spec))):
+                pending.append(i)
+        if pending:
+            jobs.append((video_path, pending))
+        else:
+            skipped += 1
+    print(f"共 {len(jobs)} 个视频需要处理（清单中已完成 {skipped} 个），使用 {num_workers} 个进程", flush=True)
+    if not jobs:
+        return 0
+
+    start = time.time()
+    total_saved = 0
+    total_frames = 0
+    with ProcessPoolExecutor(max_workers=max(1, num_workers)) as pool:
+        futures = {pool.submit(_extract_worker, v, [specs[i] for i in pending], mode, fmt, quality): pending
+                   for v, pending in jobs}
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                video_path, saved, frame_count, cost, records = future.result()
+            except Exception as e:
+                print(f"[{done}/{len(jobs)}] 处理失败：{e}", flush=True)
+                continue
+            for i, record in zip(futures[future], records):
+                if record and record.get("done"):
+                    manifests[i][record["path"]] = record
+                    save_manifest(manifests[i], specs[i]["output_root"])
+            total_saved += sum(saved)
+            total_frames += frame_count
+            elapsed = max(time.time() - start, 1e-6)
+            print(
+                f"[{done}/{len(jobs)}] {os.path.basename(video_path)}: {' + '.join(map(str, saved))} 张, "
+                f"{frame_count} 帧, 用时 {cost:.1f}s | 累计 {total_frames / elapsed:.0f} 帧/s",
+                flush=True
+            )
+
+    elapsed = max(time.time() - start, 1e-6)
+    print(
+        f"全部视频完成，总共保存 {total_saved} 张图片到："
+        f"{', '.join(spec['output_root'] for spec in specs)} "
+        f"(共 {total_frames} 帧, 用时 {elapsed:.1f}s, 平均 {total_frames / elapsed:.0f} 帧/s)"
+    )
+    return total_saved
+
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量从视频中按时间间隔抽帧")
+    parser.add_argument("video_dirs", nargs="*", default=video_dirs, help="视频文件夹，可以给多个")
+    parser.add_argument("-o", "--output", default=output_root_dir, help="图片输出的总文件夹")
+    parser.add_argument("-i", "--interval", type=float, default=interval_sec, help="每多少秒保存一帧")
+    parser.add_argument("-m", "--mode", choices=["seek", "grab", "read"], default=extract_mode)
+    parser.add_argument("-j", "--workers", type=int, default=num_workers, help="并行进程数")
+    parser.add_argument("--scene-threshold", type=float, default=scene_threshold,
+                        help="按画面变化抽帧的阈值，不填就是固定间隔")
+    parser.add_argument("--max-interval", type=float, default=max_interval_sec,
+                        help="按画面变化抽帧时，最长隔多少秒必须保存一张")
+    parser.add_argument("--also", nargs=2, action="append", metavar=("OUTPUT", "INTERVAL"),
+                        help="同一次解码再按另一个间隔输出到另一个文件夹，可以重复给多次（不给就用 extra_specs）")
+    parser.add_argument("--format", choices=["jpg", "png", "webp"], default=image_format, help="图片输出格式")
+    parser.add_argument("--quality", type=int, default=jpeg_quality, help="jpg/webp 质量 (0~100)")
+    args = parser.parse_args(argv)
 
-total_saved = 0
-for filename in os.listdir(video_dir):
-    if not filename.lower().endswith((".mp4", ".avi", ".mov", ".mkv")):
-        continue
+    specs = [make_spec(args.output, args.interval, args.scene_threshold, args.max_interval)]
+    if args.also is None:
+        specs += [make_spec(**spec) for spec in extra_specs]
+    else:
+        specs += [make_spec(output, float(interval)) for output, interval in args.also]
+    return extract_all(args.video_dirs, specs, args.mode, args.workers, args.format, args.quality)
 
-    video_path = os.path.join(video_dir, filename)
-    name, _ = os.path.splitext(filename)
-    output_dir = os.path.join(output_root_dir, name)
-    total_saved += extract_frames_from_video(video_path, output_dir, interval_sec)
 
-print(f"全部视频完成，总共保存 {total_saved} 张图片到：{output_root_dir}")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,94 +1,75 @@
-import hashlib
 import os
-from PIL import Image
-import numpy as np
-
-
-def calculate_image_hash(image_path, hash_size=8):
-    """计算图像的感知哈希"""
-    try:
-        image = Image.open(image_path)
-        # 转换为灰度图并调整大小
-        image = image.convert("L").resize((hash_size, hash_size), Image.LANCZOS)
-        pixels = np.array(image)
-        # 计算平均值并生成哈希
-        avg = pixels.mean()
-        hash_value = 0
-        for i in range(hash_size):
-            for j in range(hash_size):
-                if pixels[i, j] > avg:
-                    hash_value |= 1 << (i * hash_size + j)
-        return hash_value
-    except Exception as e:
-        print(f"Error processing {image_path}: {e}")
-        return None
-
-
-def check_dataset_overlap(train_dir, test_dir):
-    """检查训练集和测试集是否有重叠"""
-    train_hashes = {}
-    test_hashes = {}
+import sys
 
-    print("Calculating hashes for training images...")
-    train_count = 0
-    for root, dirs, files in os.walk(train_dir):
-        for file in files:
-            if file.lower().endswith(('.png', '.jpg', '.jpeg')):
-                path = os.path.join(root, file)
-                img_hash = calculate_image_hash(path)
-                if img_hash is not None:
-                    train_hashes[img_hash] = path
-                train_count += 1
-                if train_count % 100 == 0:
-                    print(f"Processed {train_count} training images...")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import image_hash
 
-    print("Calculating hashes for test images...")
-    test_count = 0
-    for root, dirs, files in os.walk(test_dir):
-        for file in files:
-            if file.lower().endswith(('.png', '.jpg', '.jpeg')):
-                path = os.path.join(root, file)
-                img_hash = calculate_image_hash(path)
-                if img_hash is not None:
-                    test_hashes[img_hash] = path
-                test_count += 1
-                if test_count % 100 == 0:
-                    print(f"Processed {test_count} test images...")
+# 训练集和验证集的 aHash 距离不超过这个值就算重叠（0 表示只找哈希完全相同的）
+HASH_DISTANCE = 5
 
-    # 查找重叠
-    train_hash_set = set(train_hashes.keys())
-    test_hash_set = set(test_hashes.keys())
-    overlap_hashes = train_hash_set.intersection(test_hash_set)
 
-    print(f"\n=== Overlap Analysis ===")
-    print(f"Training images processed: {len(train_hashes)}")
-    print(f"Test images processed: {len(test_hashes)}")
-    print(f"Overlapping images: {len(overlap_hashes)}")
+def _list_images(folder):
+    return [os.path.join(root, file)
+            for root, dirs, files in os.walk(folder)
+            for file in files if file.lower().endswith(('.png', '.jpg', '.jpeg'))]
+
 
-    if overlap_hashes:
+def check_dataset_overlap(train_dir, test_dir, max_distance=HASH_DISTANCE):
+    """
+    检查训练集和测试集是否有重叠：aHash 距离 <= max_distance 的 (train, test) 图片对都算重叠。
+    max_distance=0 就是以前的"哈希完全相同"；视频相邻帧一般差 1~5 位，设成 0 会漏掉。
+    """
+    print("Calculating hashes for training images...")
+    train_paths = _list_images(train_dir)
+    train_hashes, train_ok = image_hash.hash_files(train_paths, "ahash")
+    train_paths = [p for p, ok in zip(train_paths, train_ok) if ok]
+    train_hashes = train_hashes[train_ok]
+    print(f"Processed {len(train_paths)} training images...")
+
+    print("Calculating hashes for test images...")
+    test_paths = _list_images(test_dir)
+    test_hashes, test_ok = image_hash.hash_files(test_paths, "ahash")
+    test_paths = [p for p, ok in zip(test_paths, test_ok) if ok]
+    test_hashes = test_hashes[test_ok]
+    print(f"Processed {len(test_paths)} test images...")
+
+    # 查找重叠：训练集建索引，每张测试图只查它附近的哈希，不用两两比较
+    index = image_hash.HammingIndex(train_hashes)
+    test_idx, train_idx, dists = index.query(test_hashes, max_distance)
+    overlaps = [(train_paths[i], test_paths[j], int(d)) for j, i, d in zip(test_idx, train_idx, dists)]
+    overlap_tests = {test for _, test, _ in overlaps}
+
+    print(f"\n=== Overlap Analysis (aHash distance <= {max_distance}) ===")
+    print(f"Training images processed: {len(train_paths)}")
+    print(f"Test images processed: {len(test_paths)}")
+    print(f"Overlapping pairs: {len(overlaps)}")
+    print(f"Test images with a near-duplicate in train: {len(overlap_tests)}")
+
+    if overlaps:
         print("\nOverlapping images found:")
-        for i, hash_val in enumerate(list(overlap_hashes)):
+        for i, (train_path, test_path, dist) in enumerate(overlaps):
             if i >= 10:  # 只显示前10个重叠
-                print(f"... and {len(overlap_hashes) - 10} more overlapping images")
+                print(f"... and {len(overlaps) - 10} more overlapping pairs")
                 break
-            print(f"Hash: {hash_val}")
-            print(f"Train: {train_hashes[hash_val]}")
-            print(f"Test:  {test_hashes[hash_val]}")
+            print(f"Distance: {dist}")
+            print(f"Train: {train_path}")
+            print(f"Test:  {test_path}")
             print("---")
 
         # 保存重叠文件列表到文本文件
         with open("overlapping_images.txt", "w") as f:
             f.write("Overlapping images between train and val sets:\n")
             f.write("=" * 50 + "\n")
-            for hash_val in overlap_hashes:
-                f.write(f"Train: {train_hashes[hash_val]}\n")
-                f.write(f"Val:   {test_hashes[hash_val]}\n")
+            for train_path, test_path, dist in overlaps:
+                f.write(f"Distance: {dist}\n")
+                f.write(f"Train: {train_path}\n")
+                f.write(f"Val:   {test_path}\n")
                 f.write("-" * 30 + "\n")
         print(f"\nOverlapping images list saved to: overlapping_images.txt")
     else:
         print("✅ No overlapping images found!")
 
-    return len(overlap_hashes) > 0, overlap_hashes
+    return len(overlaps) > 0, overlaps
 
 
 def check_filename_overlap(train_dir, test_dir):
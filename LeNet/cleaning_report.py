@@ -1,18 +1,26 @@
 import os
 import shutil
+import sys
 from PIL import Image
 import imagehash
-import cv2
-import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from hash_cache import cached_hash
+from image_hash import load_ssim_thumbs, ssim_pairs
+
+
+def _average_hash(image_path):
+    image = Image.open(image_path)
+    # JPEG 直接按缩小的尺寸解码成灰度，average_hash 本来也只要 8x8 灰度
+    image.draft("L", (8, 8))
+    # 使用抗干扰性较弱的哈希算法
+    return str(imagehash.average_hash(image))
 
 
 def calculate_exact_hash(image_path):
-    """计算精确的图像哈希（抗干扰性较弱，但更准确）"""
+    """计算精确的图像哈希（抗干扰性较弱，但更准确；文件没变时直接用缓存）"""
     try:
-        image = Image.open(image_path)
-        # 使用抗干扰性较弱的哈希算法
-        hash_value = imagehash.average_hash(image)
-        return str(hash_value)
+        return cached_hash(image_path, "imagehash_ahash_draft", _average_hash)
     except Exception as e:
         print(f"Error processing {image_path}: {e}")
         return None
@@ -21,25 +29,8 @@ def calculate_exact_hash(image_path):
 def calculate_structural_similarity(img1_path, img2_path):
     """计算两张图片的结构相似性指数"""
     try:
-        # 读取图片
-        img1 = cv2.imread(img1_path)
-        img2 = cv2.imread(img2_path)
-
-        if img1 is None or img2 is None:
-            return 0
-
-        # 调整到相同尺寸
-        img1 = cv2.resize(img1, (256, 256))
-        img2 = cv2.resize(img2, (256, 256))
-
-        # 转换为灰度图
-        img1_gray = cv2.cvtColor(img1, cv2.COLOR_BGR2GRAY)
-        img2_gray = cv2.cvtColor(img2, cv2.COLOR_BGR2GRAY)
-
-        # 计算SSIM
-        from skimage.metrics import structural_similarity as ssim
-        score, _ = ssim(img1_gray, img2_gray, full=True)
-        return score
+        thumbs = load_ssim_thumbs([img1_path, img2_path], workers=2)
+        return float(ssim_pairs([(img1_path, img2_path)], thumbs)[0])
     except Exception as e:
         print(f"Error calculating SSIM: {e}")
         return 0
@@ -83,8 +74,10 @@ def find_true_duplicates(train_dir, val_dir, similarity_threshold=0.95):
     questionable_matches = []
 
     print("Step 2: Verifying matches with structural similarity...")
-    for i, (train_path, val_path) in enumerate(exact_matches):
-        similarity = calculate_structural_similarity(train_path, val_path)
+    # 每张图只解码一次，所有图片对分批并行算 SSIM
+    thumbs = load_ssim_thumbs([p for pair in exact_matches for p in pair])
+    similarities = ssim_pairs(exact_matches, thumbs)
+    for (train_path, val_path), similarity in zip(exact_matches, similarities):
 
         if similarity >= similarity_threshold:
             true_duplicates.append(val_path)
@@ -103,6 +96,7 @@ def create_verified_clean_set(train_dir, val_dir, output_dir, similarity_thresho
 
     # 找到真正的重复
     true_duplicates, questionable = find_true_duplicates(train_dir, val_dir, similarity_threshold)
+    duplicate_set = set(true_duplicates)
 
     # 创建输出目录
     os.makedirs(output_dir, exist_ok=True)
@@ -118,7 +112,7 @@ def create_verified_clean_set(train_dir, val_dir, output_dir, similarity_thresho
                 source_path = os.path.join(root, file)
 
                 # 如果这个图像不在真正的重复列表中，就复制它
-                if source_path not in true_duplicates:
+                if source_path not in duplicate_set:
                     dest_path = os.path.join(output_dir, file)
                     shutil.copy2(source_path, dest_path)
                     copied_count += 1
@@ -1,78 +1,143 @@
 import os
-import cv2
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import numpy as np
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import image_hash
+
 # 这里改成你要去重的那个“图片文件夹”
+# 如果下面是一个个视频的子文件夹（D01_...、D02_... 抽帧出来的），每个子文件夹单独去重，多个进程并行
 FOLDER_PATH = r"F:\cattle\train"
 
 # 相似度阈值：越大删得越狠（建议 10~15）
 HASH_THRESHOLD = 7
 
-
-def ahash(image, hash_size=8):
-    """平均哈希 aHash"""
-    img = cv2.resize(image, (hash_size, hash_size), interpolation=cv2.INTER_AREA)
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    avg = gray.mean()
-    hash_bits = (gray >= avg).astype(np.uint8).flatten()
-    return hash_bits
-
-
-def hamming_distance(h1, h2):
-    return np.count_nonzero(h1 != h2)
-
-
-def dedup_folder(folder_path):
-    exts = (".jpg", ".jpeg", ".png", ".bmp")
-    files = [f for f in os.listdir(folder_path)
-             if f.lower().endswith(exts)]
-
+# 时间窗口：一串相似帧中间断开（遮挡/抖动）不超过这么多帧，后面的帧还能接回这一串
+WINDOW = 5
+
+# 一串相似帧里保留哪一张："sharpest"（最清晰）或 "first"（最早的一张，和以前一样）
+KEEP = "sharpest"
+
+# 去掉的图片移到每个文件夹下的这个子文件夹里（不直接删除），并记一份 ph_journal.csv
+# 设为 None 时只写记录、不移动文件，先看看会去掉哪些
+REMOVED_DIR = "ph_removed"
+
+# 同时处理几个文件夹
+NUM_WORKERS = os.cpu_count() or 4
+
+IMG_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def temporal_runs(hashes, threshold=HASH_THRESHOLD, window=WINDOW):
+    """
+    按时间顺序的一组哈希分成相似串，返回每帧所在串的编号（串里最早一帧的下标，也是这一串的锚点）。
+    一帧和锚点距离 <= threshold 才能进这一串，所以串里每一帧都和锚点足够像，缓慢平移的镜头不会整串连成一个。
+    一串最后一帧之后 window 帧之内都还能接上（中间偶尔有一帧被遮挡/抖动，那一帧自己另起一串）。
+    """
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    labels = np.arange(len(hashes))
+    open_runs = []  # [锚点下标, 最后一帧下标]，还在窗口内、能继续接的串
+    for i in range(len(hashes)):
+        open_runs = [run for run in open_runs if i - run[1] <= window]
+        if open_runs:
+            dist = image_hash.hamming(hashes[[run[0] for run in open_runs]], hashes[i])
+            best = int(np.argmin(dist))
+            if dist[best] <= threshold:
+                labels[i] = open_runs[best][0]
+                open_runs[best][1] = i
+                continue
+        open_runs.append([i, i])
+    return labels
+
+
+def dedup_folder(folder_path, threshold=HASH_THRESHOLD, window=WINDOW, keep=KEEP, removed_dir=REMOVED_DIR):
+    """一个文件夹（一个视频抽出来的帧）单独去重，返回 (文件夹, 保留张数, 去掉张数)"""
+    files = sorted(f for f in os.listdir(folder_path) if f.lower().endswith(IMG_EXTS))
     if not files:
         print(f"[跳过] {folder_path} 没有图片文件")
-        return
-
-    files.sort()
-    print(f"[处理文件夹] {folder_path}，共 {len(files)} 张图片")
-
-    last_hash = None
-    kept = 0
-    removed = 0
-
-    for fname in files:
-        fpath = os.path.join(folder_path, fname)
-        img = cv2.imread(fpath)
-        if img is None:
-            print(f"  [跳过] 无法读取: {fname}")
-            continue
-
-        cur_hash = ahash(img)
-
-        if last_hash is None:
-            last_hash = cur_hash
-            kept += 1
-            print(f"  [保留] {fname} (第一张)")
+        return folder_path, 0, 0
+
+    # 只需要 8x8 灰度，直接按 1/8 尺寸解码；多个进程同时跑时不写共享的哈希缓存
+    hashes, ok = image_hash.hash_files([os.path.join(folder_path, f) for f in files], "ahash",
+                                       workers=2, use_cache=False)
+    for f in np.asarray(files)[~ok]:
+        print(f"  [跳过] 无法读取: {f}")
+    files = [f for f, good in zip(files, ok) if good]
+    labels = temporal_runs(hashes[ok], threshold, window)
+
+    runs = {}
+    for f, label in zip(files, labels.tolist()):
+        runs.setdefault(label, []).append(f)
+
+    journal = []
+    for members in runs.values():
+        if len(members) == 1:
             continue
-
-        dist = hamming_distance(cur_hash, last_hash)
-
-        if dist <= HASH_THRESHOLD:
-            # 太相似，删掉当前图
-            try:
-                os.remove(fpath)
-                removed += 1
-                print(f"  [删除] {fname} (与上一张距离 {dist})")
-            except Exception as e:
-                print(f"  [错误] 删除失败 {fname}: {e}")
+        if keep == "sharpest":
+            scores = [image_hash.sharpness(os.path.join(folder_path, f)) for f in members]
+            best = members[int(np.argmax(scores))]
         else:
-            last_hash = cur_hash
-            kept += 1
-            print(f"  [保留] {fname} (与上一张距离 {dist})")
-
-    print(f"[完成] {folder_path}：保留 {kept} 张，删除 {removed} 张")
+            best = members[0]
+        journal += [(f, best, len(members)) for f in members if f != best]
+
+    # 最后一次性移动，并把去掉了哪些、保留的是哪张记下来
+    if journal:
+        log_dir = os.path.join(folder_path, removed_dir or "")
+        os.makedirs(log_dir, exist_ok=True)
+        log_path = os.path.join(log_dir, "ph_journal.csv")
+        new_log = not os.path.exists(log_path)
+        with open(log_path, "a", encoding="utf-8") as log:
+            if new_log:
+                log.write("removed,kept,run_length,moved\n")
+            for f, best, run_len in journal:
+                moved = False
+                if removed_dir:
+                    try:
+                        shutil.move(os.path.join(folder_path, f), os.path.join(log_dir, f))
+                        moved = True
+                    except Exception as e:
+                        print(f"  [错误] 移动失败 {f}: {e}")
+                log.write(f"{f},{best},{run_len},{int(moved)}\n")
+
+    removed = len(journal)
+    print(f"[完成] {folder_path}：{len(runs)} 串相似帧，保留 {len(files) - removed} 张，去掉 {removed} 张")
+    return folder_path, len(files) - removed, removed
+
+
+def source_folders(root):
+    """
+    root 下每个有图片的子文件夹（一个视频一个），root 自己直接放着图片时也算一个来源，
+    和子文件夹分开去重（dedup_folder 只看文件夹本层的图片），不会因为有子文件夹就漏掉。
+    """
+    has_images = lambda path: any(f.lower().endswith(IMG_EXTS) for f in os.listdir(path))
+    subdirs = sorted(e.path for e in os.scandir(root)
+                     if e.is_dir() and e.name != REMOVED_DIR and has_images(e.path))
+    return ([root] if has_images(root) else []) + subdirs
+
+
+def dedup_sources(root, num_workers=NUM_WORKERS):
+    """每个视频文件夹各自去重，多个文件夹放到进程池里同时跑"""
+    folders = source_folders(root)
+    print(f"[开始] 共 {len(folders)} 个文件夹，{min(num_workers, len(folders))} 个进程")
+    kept = removed = 0
+    if num_workers <= 1 or len(folders) == 1:
+        results = [dedup_folder(folder) for folder in folders]
+    else:
+        with ProcessPoolExecutor(max_workers=num_workers) as pool:
+            futures = [pool.submit(dedup_folder, folder) for folder in folders]
+            results = [future.result() for future in as_completed(futures)]
+    for _, k, r in results:
+        kept += k
+        removed += r
+    print(f"[全部完成] 保留 {kept} 张，去掉 {removed} 张")
+    return kept, removed
 
 
 if __name__ == "__main__":
     if not os.path.isdir(FOLDER_PATH):
         print("文件夹不存在：", FOLDER_PATH)
     else:
-        dedup_folder(FOLDER_PATH)
\ No newline at end of file
+        dedup_sources(FOLDER_PATH)
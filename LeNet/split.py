@@ -1,11 +1,58 @@
 import os
 import json
-import cv2
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 import argparse
 
+from PIL import Image
 
-def convert_yolo_to_coco(data_dir, output_dir, classes):
+# 同时读几个文件（只读文件头和标签，主要是等磁盘，线程就够了）
+NUM_WORKERS = min(32, (os.cpu_count() or 4) * 4)
+
+# EXIF 方向是 5~8 的照片存的时候是横竖颠倒的，cv2.imread 读出来会自动转正，宽高要对调
+_TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+def image_size(image_path):
+    """
+    只读文件头拿到图片的 (宽, 高)，不解码像素（Image.open 是懒加载的，JPEG 读到 SOF 段、PNG 读到 IHDR 就停）。
+    和以前 cv2.imread(...).shape 一致：带 EXIF 旋转的照片按转正以后的宽高算。读不出来返回 None。
+    """
+    try:
+        with Image.open(image_path) as img:
+            width, height = img.size
+            if img.format == "JPEG" and img.getexif().get(0x0112) in _TRANSPOSED_ORIENTATIONS:
+                width, height = height, width
+            return width, height
+    except Exception:
+        return None
+
+
+def read_yolo_label(label_path):
+    """读一个 YOLO 标签文件，返回 [(class_id, x_center, y_center, w, h), ...]，没有文件就是空列表"""
+    boxes = []
+    if not os.path.exists(label_path):
+        return boxes
+    with open(label_path, 'r') as f:
+        for line in f:
+            # 解析YOLO格式: class_id x_center y_center width height
+            parts = line.split()
+            if len(parts) != 5:
+                continue
+            boxes.append((int(parts[0]), float(parts[1]), float(parts[2]), float(parts[3]), float(parts[4])))
+    return boxes
+
+
+def _scan_image(images_dir, labels_dir, image_file):
+    """一张图：文件头里的尺寸 + 对应的标签，交给线程池并行跑"""
+    size = image_size(os.path.join(images_dir, image_file))
+    if size is None:
+        return image_file, None, []
+    label_file = os.path.splitext(image_file)[0] + '.txt'
+    return image_file, size, read_yolo_label(os.path.join(labels_dir, label_file))
+
+
+def convert_yolo_to_coco(data_dir, output_dir, classes, splits=('train', 'val', 'test'), num_workers=NUM_WORKERS):
     """
     将YOLO格式数据集转换为COCO格式
     """
@@ -21,8 +68,8 @@ def convert_yolo_to_coco(data_dir, output_dir, classes):
             "supercategory": "animal"
         })
 
-    # 处理训练集和验证集
-    for split in ['train', 'val']:
+    # 处理训练集、验证集和测试集
+    for split in splits:
         images_dir = os.path.join(data_dir, 'images', split)
         labels_dir = os.path.join(data_dir, 'labels', split)
 
@@ -30,9 +77,9 @@ def convert_yolo_to_coco(data_dir, output_dir, classes):
             print(f"跳过 {split} 集，目录不存在")
             continue
 
-        # 获取所有图像文件
-        image_files = [f for f in os.listdir(images_dir)
-                       if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
+        # 获取所有图像文件（排好序，每次生成的 id 都一样）
+        image_files = sorted(f for f in os.listdir(images_dir)
+                             if f.lower().endswith(('.jpg', '.jpeg', '.png')))
 
         coco_output = {
             "images": [],
@@ -43,48 +90,26 @@ def convert_yolo_to_coco(data_dir, output_dir, classes):
         image_id = 1
         annotation_id = 1
 
-        for image_file in image_files:
-            # 读取图像获取尺寸
-            image_path = os.path.join(images_dir, image_file)
-            img = cv2.imread(image_path)
-            if img is None:
-                print(f"无法读取图像: {image_path}")
-                continue
-
-            height, width = img.shape[:2]
-
-            # 添加图像信息
-            coco_output["images"].append({
-                "id": image_id,
-                "file_name": image_file,
-                "width": width,
-                "height": height
-            })
-
-            # 读取对应的标签文件
-            label_file = os.path.splitext(image_file)[0] + '.txt'
-            label_path = os.path.join(labels_dir, label_file)
-
-            if os.path.exists(label_path):
-                with open(label_path, 'r') as f:
-                    lines = f.readlines()
+        # 读文件头和标签放到线程池里，map 按原来的顺序返回结果
+        with ThreadPoolExecutor(max_workers=num_workers) as pool:
+            results = pool.map(lambda f: _scan_image(images_dir, labels_dir, f), image_files)
 
-                for line in lines:
-                    line = line.strip()
-                    if not line:
-                        continue
+            for image_file, size, boxes in results:
+                if size is None:
+                    print(f"无法读取图像: {os.path.join(images_dir, image_file)}")
+                    continue
 
-                    # 解析YOLO格式: class_id x_center y_center width height
-                    parts = line.split()
-                    if len(parts) != 5:
-                        continue
+                width, height = size
 
-                    class_id = int(parts[0])
-                    x_center = float(parts[1])
-                    y_center = float(parts[2])
-                    w = float(parts[3])
-                    h = float(parts[4])
+                # 添加图像信息
+                coco_output["images"].append({
+                    "id": image_id,
+                    "file_name": image_file,
+                    "width": width,
+                    "height": height
+                })
 
+                for class_id, x_center, y_center, w, h in boxes:
                     # 转换为COCO格式: [x_min, y_min, width, height] 绝对坐标
                     x_min = (x_center - w / 2) * width
                     y_min = (y_center - h / 2) * height
@@ -106,7 +131,7 @@ def convert_yolo_to_coco(data_dir, output_dir, classes):
 
                     annotation_id += 1
 
-            image_id += 1
+                image_id += 1
 
         # 保存COCO格式的JSON文件
         output_file = os.path.join(output_dir, f'instances_{split}.json')
@@ -1,8 +1,19 @@
+import hashlib
 import os
 import random
 import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
 from sklearn.model_selection import train_test_split
 
+IMG_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+# 同时复制文件的线程数
+NUM_WORKERS = 8
+
+# 警告最多逐条打印多少条，其余只给总数
+MAX_WARNINGS = 20
+
 
 def get_image_label_pairs(image_dirs, label_dirs):
     """
@@ -19,8 +30,10 @@ def get_image_label_pairs(image_dirs, label_dirs):
             print(f"警告: 标签目录不存在 {label_dir}")
             continue
 
+        # 标签目录只列一次，之后用集合查，不再对每张图调 os.path.exists
+        label_files = set(os.listdir(label_dir))
         for img_file in os.listdir(image_dir):
-            if img_file.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp')):
+            if img_file.lower().endswith(IMG_EXTENSIONS):
                 img_path = os.path.join(image_dir, img_file)
 
                 # 构建对应的标签文件路径
@@ -28,7 +41,7 @@ def get_image_label_pairs(image_dirs, label_dirs):
                 label_path = os.path.join(label_dir, label_file)
 
                 # 检查标签文件是否存在
-                if os.path.exists(label_path):
+                if label_file in label_files:
                     pairs.append((img_path, label_path))
                 else:
                     print(f"警告: 找不到标签文件 {label_path}，跳过图像 {img_path}")
@@ -52,30 +65,79 @@ def create_directories(base_path):
         print(f"创建目录: {directory}")
 
 
-def copy_yolo_pairs(pairs, split_name, new_base_path):
-    """复制图像和标签文件对到新位置"""
-    copied_count = 0
-    for img_path, label_path in pairs:
+def _file_digest(path, chunk_size=1024 * 1024):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _copy_verified(src, dst, verify):
+    """复制一个文件，verify 为 "size" 或 "hash" 时复制完再核对，返回 (字节数, 是否一致)"""
+    shutil.copy2(src, dst)
+    size = os.path.getsize(dst)
+    if verify == "size":
+        return size, size == os.path.getsize(src)
+    if verify == "hash":
+        return size, _file_digest(src) == _file_digest(dst)
+    return size, True
+
+
+def copy_yolo_pairs(pairs, split_name, new_base_path, verify=None, num_workers=NUM_WORKERS):
+    """
+    复制图像和标签文件对到新位置（多线程）。
+    verify: None 不核对；"size" 核对文件大小；"hash" 核对内容哈希（最慢，最可靠）。
+    返回统计 dict：copied / failed / mismatched / bytes / seconds
+    """
+    def copy_pair(pair):
+        img_path, label_path = pair
         try:
             # 新路径
-            img_filename = os.path.basename(img_path)
-            label_filename = os.path.basename(label_path)
-
-            new_img_path = os.path.join(new_base_path, 'images', split_name, img_filename)
-            new_label_path = os.path.join(new_base_path, 'labels', split_name, label_filename)
+            new_img_path = os.path.join(new_base_path, 'images', split_name, os.path.basename(img_path))
+            new_label_path = os.path.join(new_base_path, 'labels', split_name, os.path.basename(label_path))
 
             # 复制文件
-            shutil.copy2(img_path, new_img_path)
-            shutil.copy2(label_path, new_label_path)
-            copied_count += 1
+            img_bytes, img_ok = _copy_verified(img_path, new_img_path, verify)
+            label_bytes, label_ok = _copy_verified(label_path, new_label_path, verify)
+            if not (img_ok and label_ok):
+                print(f"错误: 复制后核对不一致 {img_path}")
+            return img_bytes + label_bytes, img_ok and label_ok
         except Exception as e:
             print(f"错误: 复制文件时出错 {img_path} -> {e}")
-
-    print(f"成功复制 {copied_count} 个文件到 {split_name} 集合")
+            return 0, None
+
+    start = time.time()
+    stats = {"copied": 0, "failed": 0, "mismatched": 0, "bytes": 0}
+    with ThreadPoolExecutor(max_workers=num_workers) as pool:
+        for nbytes, ok in pool.map(copy_pair, pairs):
+            if ok is None:
+                stats["failed"] += 1
+                continue
+            stats["copied"] += 1
+            stats["bytes"] += nbytes
+            if not ok:
+                stats["mismatched"] += 1
+    stats["seconds"] = time.time() - start
+
+    print(f"成功复制 {stats['copied']} 个文件到 {split_name} 集合")
+    return stats
+
+
+def print_copy_summary(all_stats):
+    """汇总各集合的复制速度和出错情况"""
+    copied = sum(s["copied"] for s in all_stats.values())
+    total_bytes = sum(s["bytes"] for s in all_stats.values())
+    seconds = max(sum(s["seconds"] for s in all_stats.values()), 1e-6)
+    print("-" * 40)
+    for split, s in all_stats.items():
+        print(f"{split}: 复制 {s['copied']} 对, 失败 {s['failed']}, 核对不一致 {s['mismatched']}, 用时 {s['seconds']:.1f}s")
+    print(f"共 {copied} 对, {total_bytes / 1024 / 1024:.1f} MB, "
+          f"{copied / seconds:.1f} 对/s, {total_bytes / 1024 / 1024 / seconds:.1f} MB/s")
 
 
 def verify_split(new_base_path):
-    """验证每个集合的样本数量"""
+    """验证每个集合的样本数量，图像和标签按文件名（不含后缀）用集合配对"""
     splits = ['train', 'val', 'test']
     for split in splits:
         img_dir = os.path.join(new_base_path, 'images', split)
@@ -85,11 +147,11 @@ def verify_split(new_base_path):
             print(f"错误: {split} 集合目录不存在")
             continue
 
-        img_files = [f for f in os.listdir(img_dir) if f.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp'))]
-        label_files = [f for f in os.listdir(label_dir) if f.endswith('.txt')]
+        img_files = [f for f in os.listdir(img_dir) if f.lower().endswith(IMG_EXTENSIONS)]
+        label_stems = {os.path.splitext(f)[0] for f in os.listdir(label_dir) if f.endswith('.txt')}
 
         img_count = len(img_files)
-        label_count = len(label_files)
+        label_count = len(label_stems)
 
         print(f"{split}: {img_count} 图像, {label_count} 标签")
 
@@ -98,15 +160,17 @@ def verify_split(new_base_path):
             print(f"警告: {split}集合中图像和标签数量不匹配!")
 
         # 检查是否有对应的标签文件
-        missing_labels = 0
-        for img_file in img_files:
-            label_file = os.path.splitext(img_file)[0] + '.txt'
-            if label_file not in label_files:
-                missing_labels += 1
-                print(f"警告: 图像 {img_file} 没有对应的标签文件")
+        missing = sorted(f for f in img_files if os.path.splitext(f)[0] not in label_stems)
+        for img_file in missing[:MAX_WARNINGS]:
+            print(f"警告: 图像 {img_file} 没有对应的标签文件")
+        if len(missing) > MAX_WARNINGS:
+            print(f"... 还有 {len(missing) - MAX_WARNINGS} 个")
 
-        if missing_labels > 0:
-            print(f"警告: {split}集合中有 {missing_labels} 个图像没有对应的标签文件")
+        orphans = label_stems - {os.path.splitext(f)[0] for f in img_files}
+        if missing:
+            print(f"警告: {split}集合中有 {len(missing)} 个图像没有对应的标签文件")
+        if orphans:
+            print(f"警告: {split}集合中有 {len(orphans)} 个标签文件没有对应的图像")
 
 
 def create_data_yaml(new_base_path, class_names, train_path, val_path, test_path):
@@ -141,6 +205,9 @@ def main():
     # 类别名称列表
     class_names = ['calf','cattle']  # 替换为你的实际类别名称
 
+    # 复制后核对：None 不核对，"size" 核对大小，"hash" 核对内容
+    verify_mode = "size"
+
     # ==============================
     # 需要替换的路径部分 - 结束
     # ==============================
@@ -182,9 +249,12 @@ def main():
 
     # 复制文件到新位置
     print("复制文件到新位置...")
-    copy_yolo_pairs(train_pairs, 'train', new_dataset_root)
-    copy_yolo_pairs(val_pairs, 'val', new_dataset_root)
-    copy_yolo_pairs(test_pairs, 'test', new_dataset_root)
+    copy_stats = {
+        'train': copy_yolo_pairs(train_pairs, 'train', new_dataset_root, verify_mode),
+        'val': copy_yolo_pairs(val_pairs, 'val', new_dataset_root, verify_mode),
+        'test': copy_yolo_pairs(test_pairs, 'test', new_dataset_root, verify_mode),
+    }
+    print_copy_summary(copy_stats)
 
     # 验证划分结果
     print("验证划分结果...")
@@ -0,0 +1,201 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+
+import cv2
+import numpy as np
+
+# === 配置区域 ===
+# 索引缓存放在哪里；None 表示放在视频旁边（<视频名>.idx.npz），视频盘只读时改成一个可写的文件夹
+INDEX_DIR = None
+# ================
+
+# 索引格式版本，改了索引内容就加 1，旧缓存会自动重建
+INDEX_VERSION = 1
+
+
+def _index_path(video_path, index_dir=None):
+    index_dir = index_dir if index_dir is not None else INDEX_DIR
+    if index_dir is None:
+        return os.path.splitext(video_path)[0] + ".idx.npz"
+    # 不同文件夹里可能有同名视频，用完整路径的哈希区分
+    key = hashlib.md5(os.path.abspath(video_path).encode("utf-8")).hexdigest()[:12]
+    name = os.path.splitext(os.path.basename(video_path))[0]
+    return os.path.join(index_dir, f"{name}_{key}.idx.npz")
+
+
+def build_index(video_path):
+    """
+    扫一遍视频的压缩数据包（不解码），记录每一帧的时间戳和哪些帧是关键帧。
+    返回 dict: fps, timestamps_ms (int64 数组，下标就是帧号), keyframes (关键帧帧号数组)
+    """
+    cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG)
+    if not cap.isOpened():
+        raise IOError(f"无法打开视频：{video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+
+    # CAP_PROP_FORMAT=-1 让 grab() 只读出原始数据包，不解码，整段视频几秒就能扫完
+    raw = cap.set(cv2.CAP_PROP_FORMAT, -1)
+    timestamps = []
+    keyframes = []
+    while cap.grab():
+        if raw and cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+            keyframes.append(len(timestamps))
+        timestamps.append(cap.get(cv2.CAP_PROP_POS_MSEC))
+    cap.release()
+
+    if not raw or not keyframes:
+        # 后端不支持原始数据包模式时不知道关键帧在哪，只能把第 0 帧当作唯一的关键帧
+        keyframes = [0]
+    return {
+        "fps": fps,
+        "timestamps_ms": np.round(np.asarray(timestamps, dtype=np.float64)).astype(np.int64),
+        "keyframes": np.asarray(keyframes, dtype=np.int64),
+    }
+
+
+def load_index(video_path, index_dir=None, rebuild=False):
+    """读取缓存的索引；没有缓存或视频大小/修改时间变了就重建并写缓存"""
+    st = os.stat(video_path)
+    path = _index_path(video_path, index_dir)
+    if not rebuild and os.path.exists(path):
+        try:
+            with np.load(path) as data:
+                if (int(data["version"]) == INDEX_VERSION and int(data["size"]) == st.st_size
+                        and float(data["mtime"]) == st.st_mtime):
+                    return {
+                        "fps": float(data["fps"]),
+                        "timestamps_ms": data["timestamps_ms"],
+                        "keyframes": data["keyframes"],
+                    }
+        except (OSError, KeyError, ValueError):
+            pass
+
+    index = build_index(video_path)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, version=INDEX_VERSION, size=st.st_size, mtime=st.st_mtime, **index)
+    os.replace(tmp_path, path)
+    return index
+
+
+def frame_at(index, timestamp_sec):
+    """时间戳（秒）对应的帧号，取时间上最近的一帧"""
+    ts = index["timestamps_ms"]
+    if len(ts) == 0:
+        return 0
+    target = timestamp_sec * 1000.0
+    i = int(np.searchsorted(ts, target))
+    if i >= len(ts):
+        return len(ts) - 1
+    if i > 0 and target - ts[i - 1] <= ts[i] - target:
+        return i - 1
+    return i
+
+
+def get_frames_by_index(video_path, frame_indices, index_dir=None):
+    """
+    按帧号取帧，返回和 frame_indices 顺序一致的图片列表（取不到的位置是 None）。
+    每个目标帧先跳到它前面最近的关键帧，再往后 grab 到目标帧，只解码这一小段；
+    同一段 GOP 里的多个目标帧会顺着读，不重复跳转。
+    """
+    index = load_index(video_path, index_dir)
+    keyframes = index["keyframes"]
+    total = len(index["timestamps_ms"])
+
+    cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG)
+    if not cap.isOpened():
+        raise IOError(f"无法打开视频：{video_path}")
+
+    results = {}
+    pos = None  # 下一次 grab() 会读到的帧号；None 表示位置未知
+    for target in sorted(set(int(i) for i in frame_indices)):
+        if target < 0 or target >= total:
+            continue
+        key = int(keyframes[np.searchsorted(keyframes, target, side="right") - 1])
+        if pos is None or pos > target or pos < key:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, key)
+            pos = key
+        ok = True
+        while ok and pos < target:
+            ok = cap.grab()
+            pos += 1
+        if ok:
+            ok, frame = cap.read()
+            pos += 1
+        if ok:
+            results[target] = frame
+        else:
+            pos = None
+    cap.release()
+    return [results.get(int(i)) for i in frame_indices]
+
+
+def get_frames(video_path, timestamps, index_dir=None):
+    """按时间戳（秒）取帧，返回图片列表（取不到的位置是 None）"""
+    index = load_index(video_path, index_dir)
+    return get_frames_by_index(video_path, [frame_at(index, t) for t in timestamps], index_dir)
+
+
+def source_of(image_name, output_root_dir):
+    """
+    根据抽帧清单（cattle.py 的 extract_manifest.json）找出一张图片来自哪个视频的哪一帧。
+    image_name 可以是抽帧时的 "<视频名>/frame_00018.jpg"，也可以是 hebing2 合并后的
+    "D01_20231102152806_frame_00018.jpg"。找不到返回 None。
+    """
+    m = re.match(r"^(.*?)[_/\\](frame_\d+\.\w+)$", image_name.replace(os.sep, "/"))
+    if not m:
+        return None
+    video_stem, file_name = os.path.basename(m.group(1)), m.group(2)
+    try:
+        with open(os.path.join(output_root_dir, "extract_manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    for video_path, record in manifest.items():
+        if os.path.splitext(os.path.basename(video_path))[0] == video_stem:
+            frame_idx = record.get("frames", {}).get(file_name)
+            if frame_idx is not None:
+                return video_path, frame_idx
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="从视频里按时间戳或帧号直接取出指定帧")
+    parser.add_argument("video", help="视频路径；加 --manifest 时是抽出来的图片名，比如 D01_20231102152806_frame_00018.jpg")
+    parser.add_argument("points", nargs="*", type=float, help="时间戳（秒）；加 --frames 时表示帧号")
+    parser.add_argument("--frames", action="store_true", help="points 是帧号而不是秒")
+    parser.add_argument("--manifest", help="抽帧输出总文件夹（里面有 extract_manifest.json），用来由图片名反查视频和帧号")
+    parser.add_argument("--around", type=int, default=0, help="每个点前后再各取几帧")
+    parser.add_argument("-o", "--output", default=".", help="图片保存的文件夹")
+    args = parser.parse_args(argv)
+
+    if args.manifest:
+        found = source_of(args.video, args.manifest)
+        if found is None:
+            print(f"清单里找不到这张图片的来源：{args.video}")
+            return
+        args.video, frame_idx = found
+        args.points, args.frames = [frame_idx], True
+        print(f"来源：{args.video} 第 {frame_idx} 帧")
+
+    index = load_index(args.video)
+    centers = [int(p) for p in args.points] if args.frames else [frame_at(index, p) for p in args.points]
+    wanted = sorted({c + d for c in centers for d in range(-args.around, args.around + 1)})
+
+    os.makedirs(args.output, exist_ok=True)
+    name = os.path.splitext(os.path.basename(args.video))[0]
+    saved = 0
+    for frame_idx, frame in zip(wanted, get_frames_by_index(args.video, wanted)):
+        if frame is None:
+            continue
+        save_path = os.path.join(args.output, f"{name}_src{frame_idx:07d}.jpg")
+        if cv2.imwrite(save_path, frame):
+            saved += 1
+    print(f"共取出 {saved} 帧，保存在：{os.path.abspath(args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,13 @@
+import argparse
+import json
 import os
 import random
-import shutil
+from collections import Counter
+
 from tqdm import tqdm  # 如果没有这个库，可以去掉这行和下面的 tqdm
 
+from link_copy import link_or_copy
+
 # ================= 配置区域 =================
 # 1. 你的原始图片文件夹 (乱序、名字乱七八糟的)
 SOURCE_DIR = r"F:\cattle3\train_merged_all"
@@ -14,52 +19,229 @@ TARGET_DIR = r"F:\cattle3\train_shuffled_final"
 # 如果填 "", 文件名就是 000001.jpg
 # 如果填 "cattle_", 文件名就是 cattle_000001.jpg
 PREFIX = "cattle" 
+
+# 4. 怎么生成打乱后的文件：
+#   "copy"     复制到 TARGET_DIR（以前的做法，占双倍空间）
+#   "hardlink" 在 TARGET_DIR 建硬链接（同一分区内不占空间，跨分区自动退回复制）
+#   "rename"   直接在 SOURCE_DIR 里改名（不需要 TARGET_DIR，只改目录项）
+MODE = "hardlink"
+
+# 5. 随机种子，固定以后每次打乱结果一样；None 表示每次都不同
+SEED = 42
 # ===========================================
 
-def shuffle_and_rename():
+# 新旧名字对照表，放在新名字所在的文件夹里，用来追溯每张图的来源或者撤销改名
+MANIFEST_NAME = "shuffle_manifest.csv"
+# 原地改名进行到哪一步了（中途断了可以接着跑）
+STATE_NAME = ".shuffle_state"
+VALID_EXTS = {'.jpg', '.jpeg', '.png', '.bmp'}
+
+
+def make_shuffle_plan(images, prefix=PREFIX, seed=None):
+    """
+    随机打乱并生成新名字，返回 [(原文件名, 新文件名), ...]
+    新名字: 前缀 + 6位序号 + 原后缀，比如 cattle000001.jpg；给 seed 可以复现同一个顺序
+    """
+    images = list(images)
+    random.Random(seed).shuffle(images)
+    return [(name, f"{prefix}{i + 1:06d}{os.path.splitext(name)[1].lower()}")
+            for i, name in enumerate(images)]
+
+
+def with_labels(plan, folder):
+    """同名的 YOLO 标签 .txt 跟着图片一起改名"""
+    labels = []
+    for old, new in plan:
+        label = os.path.splitext(old)[0] + ".txt"
+        if os.path.exists(os.path.join(folder, label)):
+            labels.append((label, os.path.splitext(new)[0] + ".txt"))
+    return plan + labels
+
+
+def save_manifest(plan, path):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("new_name,old_name\n")
+        for old, new in plan:
+            f.write(f"{new},{old}\n")
+
+
+def load_manifest(path):
+    """读对照表，返回 [(原文件名, 新文件名), ...]"""
+    with open(path, "r", encoding="utf-8") as f:
+        next(f)
+        return [tuple(reversed(line.rstrip("\n").split(",", 1))) for line in f if line.strip()]
+
+
+def trace(new_name, manifest_path):
+    """新名字 → 原来的名字（找不到返回 None）"""
+    return {new: old for old, new in load_manifest(manifest_path)}.get(new_name)
+
+
+def load_state(folder):
+    """上次没做完的原地改名：返回 (进度, 改名计划)，没有就返回 None"""
+    state_path = os.path.join(folder, STATE_NAME)
+    if not os.path.exists(state_path):
+        return None
+    with open(state_path, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    return state["phase"], [tuple(pair) for pair in state["plan"]]
+
+
+def rename_in_place(folder, plan=None):
+    """
+    两步改名：先全部改成临时名，再改成新名。新旧名字有重叠（比如对已经打乱过的文件夹再打乱一次）也不会互相覆盖。
+    改名计划和进度记在 STATE_NAME 里，中途断了不传 plan 再调用一次，会从断的地方接着做。
+    有没做完的改名时传进来的 plan 必须和记下的一样，否则报错，不会拿记下的计划顶替。
+    """
+    state_path = os.path.join(folder, STATE_NAME)
+    phase = "phase1"
+    pending = load_state(folder)
+    if pending is not None:
+        if plan is not None and [tuple(pair) for pair in plan] != pending[1]:
+            raise RuntimeError(f"{folder} 里有没做完的另一次改名（{STATE_NAME}），先把它做完再改")
+        phase, plan = pending
+    elif plan is None:
+        raise ValueError("没有改名计划，也没有没做完的改名")
+
+    def set_state(value):
+        with open(state_path, "w", encoding="utf-8") as f:
+            json.dump({"phase": value, "plan": plan}, f, ensure_ascii=False)
+
+    tmp_names = [f".shuffle_tmp_{i:07d}{os.path.splitext(new)[1]}" for i, (_, new) in enumerate(plan)]
+    if phase == "phase1":
+        set_state("phase1")
+        for (old, _), tmp in zip(tqdm(plan, desc="第一步"), tmp_names):
+            if not os.path.exists(os.path.join(folder, tmp)):
+                os.rename(os.path.join(folder, old), os.path.join(folder, tmp))
+        set_state("phase2")
+    for (_, new), tmp in zip(tqdm(plan, desc="第二步"), tmp_names):
+        if os.path.exists(os.path.join(folder, tmp)):
+            os.rename(os.path.join(folder, tmp), os.path.join(folder, new))
+    os.remove(state_path)
+
+
+def undo_rename(folder):
+    """
+    按对照表把原地改过名的文件夹改回原来的名字。
+    有没做完的改名时先把它做完：如果那就是一次没做完的撤销，做完就已经是原名；否则再按对照表反过来改。
+    确认原名都回到盘上了才删对照表。
+    """
+    manifest_path = os.path.join(folder, MANIFEST_NAME)
+    rows = load_manifest(manifest_path)
+    inverse = [(new, old) for old, new in rows]
+
+    pending = load_state(folder)
+    if pending is not None:
+        print("发现上次没做完的改名，先把它做完...")
+        rename_in_place(folder)
+    if pending is None or pending[1] != inverse:
+        missing = [new for new, _ in inverse if not os.path.exists(os.path.join(folder, new))]
+        if missing:
+            print(f"❌ 对照表里有 {len(missing)} 个新名字不在文件夹里（比如 {missing[0]}），没有改动，对照表保留")
+            return False
+        rename_in_place(folder, inverse)
+
+    missing = [old for old, _ in rows if not os.path.exists(os.path.join(folder, old))]
+    if missing:
+        print(f"❌ 还有 {len(missing)} 个原名没有恢复（比如 {missing[0]}），对照表保留: {manifest_path}")
+        return False
+    os.remove(manifest_path)
+    print(f"已恢复 {len(rows)} 个文件的原名: {folder}")
+    return True
+
+
+def shuffle_and_rename(mode=MODE, seed=SEED):
     # 1. 检查路径
     if not os.path.exists(SOURCE_DIR):
         print("找不到源文件夹！")
         return
-    if not os.path.exists(TARGET_DIR):
-        os.makedirs(TARGET_DIR)
+    out_dir = SOURCE_DIR if mode == "rename" else TARGET_DIR
+    if not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+
+    pending = load_state(SOURCE_DIR) if mode == "rename" else None
+    if pending is not None:
+        # 上次原地改名没做完，按上次记下的计划接着做；没做完的是一次撤销就按撤销收尾（对照表也要删）
+        print("发现上次没做完的改名，继续...")
+        if pending[1] == [(new, old) for old, new in load_manifest(manifest_path)]:
+            undo_rename(SOURCE_DIR)
+        else:
+            rename_in_place(SOURCE_DIR)
+        print("完成！")
+        return
 
     # 2. 获取所有图片
     print("正在读取图片列表...")
-    valid_exts = {'.jpg', '.jpeg', '.png', '.bmp'}
-    images = [f for f in os.listdir(SOURCE_DIR) if os.path.splitext(f)[1].lower() in valid_exts]
+    images = sorted(f for f in os.listdir(SOURCE_DIR) if os.path.splitext(f)[1].lower() in VALID_EXTS)
     
     total_num = len(images)
     print(f"共找到 {total_num} 张图片。")
 
-    # 3. 【关键步骤】随机打乱
+    # 3. 【关键步骤】随机打乱（排好序再按种子打乱，同一个种子结果完全一样）
     print("正在洗牌 (Shuffling)...")
-    random.shuffle(images)
+    plan = with_labels(make_shuffle_plan(images, seed=seed), SOURCE_DIR)
 
-    # 4. 复制并重命名
-    print("正在复制并重命名...")
-    
-    # 使用 tqdm 显示进度条 (如果没有装 tqdm，就把 range(total_num) 放进循环里)
-    # 也就是: for i, filename in enumerate(images):
-    for i, filename in enumerate(tqdm(images)):
-        # 获取原文件后缀 (.jpg)
-        ext = os.path.splitext(filename)[1].lower()
-        
-        # 构造新名字: 000001.jpg (6位数字，不够补零)
-        new_name = f"{PREFIX}{i+1:06d}{ext}"
-        
-        src_path = os.path.join(SOURCE_DIR, filename)
-        dst_path = os.path.join(TARGET_DIR, new_name)
-        
-        # 复制文件 (使用 copy2 保留文件时间戳等信息)
-        shutil.copy2(src_path, dst_path)
+    # 4. 先写对照表，再动文件。源文件夹本身是打乱过的，就接上它的对照表，新名字直接对应最早的原名
+    source_manifest = os.path.join(SOURCE_DIR, MANIFEST_NAME)
+    if os.path.exists(source_manifest):
+        earlier = {new: old for old, new in load_manifest(source_manifest)}
+        save_manifest([(earlier.get(old, old), new) for old, new in plan], manifest_path)
+    else:
+        save_manifest(plan, manifest_path)
+
+    if mode == "rename":
+        print("正在原地改名...")
+        rename_in_place(SOURCE_DIR, plan)
+    else:
+        print("正在复制并重命名..." if mode == "copy" else "正在建立硬链接...")
+        # 使用 tqdm 显示进度条 (如果没有装 tqdm，就把 tqdm(plan) 换成 plan)
+        methods = Counter()
+        for filename, new_name in tqdm(plan):
+            src_path = os.path.join(SOURCE_DIR, filename)
+            dst_path = os.path.join(TARGET_DIR, new_name)
+            # copy 模式用 copy2 保留文件时间戳等信息
+            methods[link_or_copy(src_path, dst_path, mode)] += 1
+        print("方式统计: " + ", ".join(f"{k} {v}" for k, v in methods.items()))
 
     print("-" * 30)
     print("完成！")
-    print(f"打乱后的图片已保存在: {TARGET_DIR}")
-    print("原来的文件夹没动，确认新文件夹没问题后可以手动删除旧的。")
+    print(f"打乱后的图片在: {out_dir}")
+    print(f"新旧名字对照表: {manifest_path}")
+    if mode != "rename":
+        print("原来的文件夹没动，确认新文件夹没问题后可以手动删除旧的。")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="随机打乱并重命名图片，保留新旧名字对照表")
+    parser.add_argument("--mode", choices=("copy", "hardlink", "rename"), default=MODE)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--undo", metavar="FOLDER", help="把原地改过名的文件夹改回原名")
+    parser.add_argument("--trace", metavar="NAME", help="查一张打乱后的图片原来叫什么（比如 cattle000123.jpg）")
+    parser.add_argument("--manifest", default=None, help="--trace 用的对照表，默认是 TARGET_DIR 里的")
+    parser.add_argument("--frames-root", default=None,
+                        help="抽帧输出总文件夹（有 extract_manifest.json），给了就继续查到视频和帧号")
+    args = parser.parse_args(argv)
+
+    if args.undo:
+        undo_rename(args.undo)
+    elif args.trace:
+        manifest_path = args.manifest or os.path.join(TARGET_DIR, MANIFEST_NAME)
+        old = trace(args.trace, manifest_path)
+        if old is None:
+            print(f"对照表里没有 {args.trace}")
+            return
+        print(f"{args.trace} 原名: {old}")
+        if args.frames_root:
+            from LeNet.video_index import source_of
+
+            found = source_of(old, args.frames_root)
+            print(f"来源: {found[0]} 第 {found[1]} 帧" if found else "抽帧清单里找不到这张图的来源")
+    else:
+        shuffle_and_rename(args.mode, args.seed)
+
 
 if __name__ == '__main__':
     # 如果报错 No module named 'tqdm'，请在终端 pip install tqdm
     # 或者删掉代码里的 tqdm 相关部分
-    shuffle_and_rename()
\ No newline at end of file
+    main()
@@ -0,0 +1,112 @@
+"""
+所有去重/查重脚本共用的哈希缓存（SQLite）。
+以 (绝对路径, 文件大小, 修改时间 ns) 为键，保存算过的 MD5、aHash、pHash 等。
+文件没变就直接返回缓存里的值，只有新增或改过的文件才会重新读盘计算。
+
+用法：
+    from hash_cache import cached_hash
+    md5 = cached_hash(path, "md5", compute_md5)
+"""
+import atexit
+import os
+import sqlite3
+import threading
+
+# ================= 配置区域 =================
+# 缓存数据库的位置，可以用环境变量 CATTLE_HASH_CACHE 改
+CACHE_DB = os.environ.get("CATTLE_HASH_CACHE",
+                          os.path.join(os.path.expanduser("~"), ".cattle_hash_cache.sqlite"))
+# ===========================================
+
+# 攒够这么多条新结果再提交一次，避免每个文件都写一次盘
+COMMIT_EVERY = 500
+
+
+class HashCache:
+    def __init__(self, db_path=CACHE_DB):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS hashes ("
+            " path TEXT NOT NULL, kind TEXT NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,"
+            " value TEXT, PRIMARY KEY (path, kind))"
+        )
+        self._dirty = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    def lookup(self, path, kind, st=None):
+        """有且未过期返回 (True, 值)，否则 (False, None)"""
+        st = st or os.stat(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, value FROM hashes WHERE path=? AND kind=?", (self._key(path), kind)
+            ).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return True, row[2]
+        return False, None
+
+    def store(self, path, kind, value, st=None):
+        st = st or os.stat(path)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO hashes (path, kind, size, mtime_ns, value) VALUES (?, ?, ?, ?, ?)",
+                (self._key(path), kind, st.st_size, st.st_mtime_ns, value),
+            )
+            self._dirty += 1
+            if self._dirty >= COMMIT_EVERY:
+                self._conn.commit()
+                self._dirty = 0
+
+    def get(self, path, kind, compute):
+        """
+        取 path 的 kind 哈希，没有缓存或文件变了就调用 compute(path) 计算并存起来。
+        compute 返回 None 表示算不出来（比如图片坏了），这种结果不缓存。
+        值统一按字符串存，调用方自己转换（比如整数哈希用 str/int 来回转）。
+        """
+        st = os.stat(path)
+        ok, value = self.lookup(path, kind, st)
+        if ok:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = compute(path)
+        if value is not None:
+            value = str(value)
+            self.store(path, kind, value, st)
+        return value
+
+    def flush(self):
+        with self._lock:
+            self._conn.commit()
+            self._dirty = 0
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_cache():
+    """进程内共用的缓存对象，程序退出时自动提交"""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = HashCache()
+            atexit.register(_default.close)
+        return _default
+
+
+def cached_hash(path, kind, compute):
+    """default_cache().get 的简写"""
+    return default_cache().get(path, kind, compute)
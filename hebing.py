@@ -1,11 +1,18 @@
 # python
-import shutil
+from collections import Counter
 from pathlib import Path
 
+from link_copy import link_or_copy
+
 IMAGE_EXTS = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff'}
 
 
-def rename_images_in_folder(folder_path, prefix="", start_num=1, pad=4, merge_to=None):
+def rename_images_in_folder(folder_path, prefix="", start_num=1, pad=4, merge_to=None, link_mode="copy", stats=None):
+    """
+    把文件夹里的图片按序号重命名，可选再放一份到 merge_to。
+    link_mode 见 link_copy.LINK_MODES："auto"/"hardlink" 同分区只建链接不占空间，跨分区自动退回复制。
+    stats 传一个 Counter 进来可以统计每种方式用了多少次。
+    """
     folder = Path(folder_path)
     if not folder.is_dir():
         print(f"错误: {folder_path} 不是有效文件夹")
@@ -24,10 +31,12 @@ def rename_images_in_folder(folder_path, prefix="", start_num=1, pad=4, merge_to
             p.rename(new_path)
             print(f"{p.name} -> {new_name}")
 
-            # 复制到合并文件夹
+            # 放到合并文件夹（复制或链接）
             if merge_to:
-                shutil.copy2(new_path, merge_path / new_name)
-                print(f"  已复制到: {merge_to}")
+                method = link_or_copy(new_path, merge_path / new_name, link_mode)
+                if stats is not None:
+                    stats[method] += 1
+                print(f"  已{'复制' if method == 'copy' else '链接(' + method + ')'}到: {merge_to}")
 
             counter += 1
     return counter
@@ -87,7 +96,12 @@ if __name__ == "__main__":
     prefix = "images"
     counter = 1
     merge_target = r"F:\cattle\train"
+    # "auto": 同分区硬链接（不占空间，秒完成），跨分区自动复制；想保持原来的真复制就改成 "copy"
+    link_mode = "auto"
 
+    stats = Counter()
     for folder in folders:
         print(f"\n处理文件夹: {folder}")
-        counter = rename_images_in_folder(folder, prefix=prefix, start_num=counter, pad=4, merge_to=merge_target)
+        counter = rename_images_in_folder(folder, prefix=prefix, start_num=counter, pad=4, merge_to=merge_target,
+                                          link_mode=link_mode, stats=stats)
+    print(f"\n合并完成: {dict(stats)}")
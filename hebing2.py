@@ -1,5 +1,33 @@
 import os
-import shutil
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from link_copy import link_or_copy
+
+# 支持的图片格式
+IMG_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff'}
+
+# 每处理多少张打印一次进度
+PRINT_EVERY = 500
+
+
+def iter_source_images(source_dir, img_extensions=IMG_EXTENSIONS):
+    """
+    遍历大文件夹下所有子文件夹里的图片，产出 (源路径, 合并后的新文件名)。
+    新名字 = 文件夹名 + "_" + 原文件名，例如 D01_20231101235950_0001.jpg
+    """
+    # os.walk 会自动一层层往下找，你不需要输入 D01 那一层的路径
+    for root, dirs, files in os.walk(source_dir):
+        # 跳过大文件夹根目录本身，防止重复处理
+        if root == source_dir:
+            continue
+        # 获取当前子文件夹的名字，例如 "D01_20231101235950"
+        folder_name = os.path.basename(root)
+        for file in files:
+            if os.path.splitext(file)[1].lower() in img_extensions:
+                yield os.path.join(root, file), f"{folder_name}_{file}"
+
 
 def merge_dataset_images():
     # --- 这里是你可以直接修改的配置 ---
@@ -10,56 +38,75 @@ def merge_dataset_images():
     
     # 2. 合并后的图片存放位置 (如果不存在会自动创建)
     target_dir = r"F:\cattle3\train_merged_all"
+
+    # 3. 放到合并文件夹的方式 (见 link_copy.py)
+    # "auto": 同一个分区就建硬链接，不占空间、几乎瞬间完成；跨分区自动退回复制
+    # "copy": 和以前一样真复制；"symlink": 跨分区也不复制，但源文件不能删
+    link_mode = "auto"
+
+    # 4. 同时复制的线程数 (网络盘/USB 盘上多线程能把延迟叠起来，一般 8~16)
+    num_threads = 8
     
     # --------------------------------
     
-    # 支持的图片格式
-    img_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff'}
-
     if not os.path.exists(target_dir):
         os.makedirs(target_dir)
 
     count = 0
+    total_bytes = 0
+    methods = Counter()
+    start = time.time()
     print(f"正在扫描大文件夹: {source_dir} ...")
 
-    # os.walk 会自动一层层往下找，你不需要输入 D01 那一层的路径
-    for root, dirs, files in os.walk(source_dir):
-        for file in files:
-            ext = os.path.splitext(file)[1].lower()
-            if ext in img_extensions:
-                # 获取当前子文件夹的名字，例如 "D01_20231101235950"
-                folder_name = os.path.basename(root)
-                
-                # 跳过大文件夹根目录本身，防止重复处理
-                if root == source_dir:
-                    continue
-
-                # --- 核心重命名逻辑 ---
-                # 新名字 = 文件夹名 + "_" + 原文件名
-                # 结果示例: D01_20231101235950_0001.jpg
-                new_filename = f"{folder_name}_{file}"
-                
-                # 构建完整路径
-                src_path = os.path.join(root, file)
-                dst_path = os.path.join(target_dir, new_filename)
-
-                # 防止极少数情况下的重名 (自动加数字后缀)
-                duplicate_count = 1
-                while os.path.exists(dst_path):
-                    name_no_ext = os.path.splitext(new_filename)[0]
-                    dst_path = os.path.join(target_dir, f"{name_no_ext}_{duplicate_count}{ext}")
-                    duplicate_count += 1
-
-                try:
-                    shutil.copy2(src_path, dst_path)
-                    count += 1
-                    # 打印进度 (可选，嫌刷屏可以注释掉)
-                    print(f"处理: {folder_name} -> {new_filename}")
-                except Exception as e:
-                    print(f"错误: {src_path} -> {e}")
+    # 目标文件夹只列一次，重名检查全在内存里做，不用每个文件都去磁盘上 stat
+    # (Windows 文件名不分大小写，用 normcase 统一)
+    used_names = {os.path.normcase(name) for name in os.listdir(target_dir)}
+
+    def place(src_path, dst_path):
+        # 名字已经在 used_names 里查过重，不用再去盘上探一次 dst 在不在
+        method = link_or_copy(src_path, dst_path, link_mode, fresh=True)
+        return method, os.path.getsize(src_path)
+
+    def collect(done):
+        nonlocal count, total_bytes
+        for future in done:
+            src_path = pending.pop(future)
+            try:
+                method, size = future.result()
+            except Exception as e:
+                print(f"错误: {src_path} -> {e}")
+                continue
+            methods[method] += 1
+            total_bytes += size
+            count += 1
+            if count % PRINT_EVERY == 0:
+                elapsed = max(time.time() - start, 1e-6)
+                print(f"已合并 {count} 张 ({count / elapsed:.0f} 张/s)", flush=True)
+
+    pending = {}
+    with ThreadPoolExecutor(max_workers=num_threads) as pool:
+        for src_path, new_filename in iter_source_images(source_dir):
+            ext = os.path.splitext(new_filename)[1].lower()
+
+            # 防止极少数情况下的重名 (自动加数字后缀)
+            duplicate_count = 1
+            name_no_ext = os.path.splitext(new_filename)[0]
+            while os.path.normcase(new_filename) in used_names:
+                new_filename = f"{name_no_ext}_{duplicate_count}{ext}"
+                duplicate_count += 1
+            used_names.add(os.path.normcase(new_filename))
+
+            dst_path = os.path.join(target_dir, new_filename)
+            pending[pool.submit(place, src_path, dst_path)] = src_path
+            # 积压的任务有上限，扫描太快时先等一部分做完
+            if len(pending) >= num_threads * 4:
+                collect(wait(pending, return_when=FIRST_COMPLETED).done)
+        collect(wait(pending).done)
 
+    elapsed = max(time.time() - start, 1e-6)
     print("-" * 30)
-    print(f"搞定！共合并了 {count} 张图片。")
+    print(f"搞定！共合并了 {count} 张图片。{dict(methods)}")
+    print(f"用时 {elapsed:.1f}s, {count / elapsed:.0f} 张/s, {total_bytes / 1024 / 1024 / elapsed:.1f} MB/s")
     print(f"文件保存在: {target_dir}")
 
 if __name__ == '__main__':
@@ -0,0 +1,437 @@
+"""
+批量感知哈希：aHash / dHash / pHash，每张图的 64 位哈希打包成一个 uint64，
+一批图片就是一个 uint64 数组，海明距离用 XOR + popcount 对整个数组一次算完。
+另外还有缩略图解码、批量 SSIM、海明近邻索引和聚类，各个去重/查重脚本共用。
+
+用法：
+    from image_hash import hash_files, hamming
+    hashes, ok = hash_files(paths, "phash")
+    dist = hamming(hashes, hashes[0])      # 第一张和所有图的距离，一次调用
+"""
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from hash_cache import default_cache
+
+HASH_KINDS = ("ahash", "dhash", "phash")
+
+# 解码图片的线程数（cv2 解码时会释放 GIL）
+NUM_WORKERS = min(32, (os.cpu_count() or 4) * 2)
+# 一次解码/计算多少张，控制内存
+BATCH_SIZE = 4096
+
+# SSIM 比较时的图片尺寸、每个任务算的图片对数和线程数
+# （cv2.blur 本身已经是多线程的，再多开线程只会多占内存）
+SSIM_SIZE = 256
+SSIM_BATCH = 64
+SSIM_WORKERS = min(4, os.cpu_count() or 4)
+
+# 每种哈希需要的灰度图尺寸 (宽, 高)
+_INPUT_SIZE = {"ahash": (8, 8), "dhash": (9, 8), "phash": (32, 32)}
+
+
+def _dct_matrix(n):
+    """
+    不归一化的 DCT-II 矩阵（和 scipy.fftpack.dct 默认的一样），D @ X @ D.T 就是 X 的二维 DCT。
+    imagededup 的 PHash 用的就是这个版本；正交归一化会把第 0 行/列相对缩小，和中位数比较时结果不一样。
+    """
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    return (2.0 * np.cos(np.pi * (2 * i + 1) * k / (2 * n))).astype(np.float32)
+
+
+# pHash 只要左上角 8x8 的低频系数
+_DCT8 = _dct_matrix(32)[:8]
+
+# 缓存里的哈希种类名；pHash 改成和 imagededup 一样的定义后换了名字，不和旧的值混用
+_CACHE_KIND = {"ahash": "ahash64_thumb", "dhash": "dhash64_thumb", "phash": "phash64_thumb_idd"}
+
+# JPEG 可以在解码时直接按 1/2、1/4、1/8 缩小（DCT 缩放），比全尺寸解码再缩小快好几倍
+_REDUCED_GRAY = ((8, cv2.IMREAD_REDUCED_GRAYSCALE_8), (4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+                 (2, cv2.IMREAD_REDUCED_GRAYSCALE_2), (1, cv2.IMREAD_GRAYSCALE))
+
+# 0-255 每个字节里 1 的个数（没有 np.bitwise_count 的老 numpy 用）
+_POPCOUNT8 = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+
+
+def popcount64(values):
+    """uint64 数组逐个数 1 的位数"""
+    values = np.asarray(values, dtype=np.uint64)
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    as_bytes = np.ascontiguousarray(values).reshape(-1).view(np.uint8)
+    return _POPCOUNT8[as_bytes].reshape(values.shape + (8,)).sum(axis=-1)
+
+
+def hamming(hashes, h):
+    """hashes（uint64 数组）里每一个和 h 的海明距离"""
+    return popcount64(np.asarray(hashes, dtype=np.uint64) ^ np.uint64(h))
+
+
+def hamming_matrix(a, b):
+    """两组哈希两两之间的海明距离，形状 (len(a), len(b))"""
+    a = np.asarray(a, dtype=np.uint64)
+    b = np.asarray(b, dtype=np.uint64)
+    return popcount64(a[:, None] ^ b[None, :])
+
+
+def pack_bits(bits):
+    """(N, 64) 的布尔数组打包成 N 个 uint64；第 k 位对应第 k 个像素"""
+    bits = np.asarray(bits, dtype=bool).reshape(len(bits), 64)
+    return np.packbits(bits, axis=1, bitorder="little").view("<u8").reshape(-1).astype(np.uint64)
+
+
+def to_gray(image, kind):
+    """BGR 或灰度图缩放成 kind 需要的小灰度图（先缩小再转灰度，和 ph.py 原来的顺序一样）"""
+    small = cv2.resize(image, _INPUT_SIZE[kind], interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+
+
+def hash_grays(grays, kind="ahash"):
+    """已经缩放好的一批小灰度图 (N, 高, 宽) → N 个 uint64 哈希"""
+    if kind not in HASH_KINDS:
+        raise ValueError(f"不支持的哈希：{kind}，可选 {HASH_KINDS}")
+    g = np.asarray(grays, dtype=np.float32)
+    if len(g) == 0:
+        return np.zeros(0, dtype=np.uint64)
+    if kind == "ahash":
+        bits = g >= g.mean(axis=(1, 2), keepdims=True)
+    elif kind == "dhash":
+        bits = g[:, :, 1:] > g[:, :, :-1]
+    else:
+        # 和 imagededup 的 PHash 一样：中位数不算直流分量（第 0 个系数），>= 中位数记 1
+        low = _DCT8 @ g @ _DCT8.T
+        flat = low.reshape(len(g), 64)
+        bits = flat >= np.median(flat[:, 1:], axis=1, keepdims=True)
+    return pack_bits(bits.reshape(len(g), 64))
+
+
+def hash_images(images, kind="ahash"):
+    """已经解码的一批图片（BGR 或灰度）→ N 个 uint64 哈希"""
+    return hash_grays([to_gray(img, kind) for img in images], kind)
+
+
+def load_thumbnail(path, min_size):
+    """
+    直接解码成小灰度图：按文件头里的尺寸选最大的缩小倍数（最多 1/8），保证宽高都不小于 min_size。
+    min_size 可以是一个数或 (宽, 高)。读不了返回 None。
+    缩小解码和全尺寸解码再缩小的结果有细微差别（1920x1080 测试图上）：pHash 差 0~2 位，
+    aHash/dHash 大多差 0~3 位、个别到 7 位，256x256 灰度图平均每个像素差 1~2 个灰度级。
+    用 aHash 做阈值判断时不要和全尺寸解码算出来的旧哈希混着比。
+    """
+    min_w, min_h = (min_size, min_size) if np.isscalar(min_size) else min_size
+    try:
+        # np.fromfile + imdecode 可以读中文路径
+        data = np.fromfile(path, dtype=np.uint8)
+        # PIL 打开只读文件头，拿到尺寸
+        width, height = Image.open(io.BytesIO(data)).size
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+    for factor, flag in _REDUCED_GRAY:
+        if width // factor >= min_w and height // factor >= min_h:
+            return cv2.imdecode(data, flag)
+    return cv2.imdecode(data, cv2.IMREAD_GRAYSCALE)
+
+
+def sharpness(path, size=256):
+    """清晰度：缩略图拉普拉斯响应的方差，越大越清楚；读不了返回 -1"""
+    thumb = load_thumbnail(path, size)
+    return float(cv2.Laplacian(thumb, cv2.CV_64F).var()) if thumb is not None else -1.0
+
+
+def _load_ssim_thumb(image_path, size=SSIM_SIZE):
+    """解码成 size x size 的灰度图，读不了返回 None"""
+    img = load_thumbnail(image_path, size)
+    if img is None:
+        return None
+    return cv2.resize(img, (size, size))
+
+
+def load_ssim_thumbs(paths, size=SSIM_SIZE, workers=NUM_WORKERS):
+    """并行解码一批图片，返回 {路径: 灰度缩略图}，每张图只解码一次；读不了的不在结果里"""
+    paths = list(dict.fromkeys(paths))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        thumbs = pool.map(lambda p: _load_ssim_thumb(p, size), paths)
+        return {p: t for p, t in zip(paths, thumbs) if t is not None}
+
+
+def _box_mean(x, win):
+    """二维图每个 win x win 窗口的均值，只保留窗口完全在图内的位置（win 为奇数）"""
+    r = win // 2
+    return cv2.blur(x, (win, win))[r:x.shape[0] - r, r:x.shape[1] - r]
+
+
+def _ssim_one(x, y, win_size, data_range):
+    x = np.asarray(x, dtype=np.float32)
+    y = np.asarray(y, dtype=np.float32)
+    cov_norm = win_size * win_size / (win_size * win_size - 1.0)
+    ux, uy = _box_mean(x, win_size), _box_mean(y, win_size)
+    vx = cov_norm * (_box_mean(x * x, win_size) - ux * ux)
+    vy = cov_norm * (_box_mean(y * y, win_size) - uy * uy)
+    vxy = cov_norm * (_box_mean(x * y, win_size) - ux * uy)
+    c1 = (0.01 * data_range) ** 2
+    c2 = (0.03 * data_range) ** 2
+    s = ((2 * ux * uy + c1) * (2 * vxy + c2)) / ((ux * ux + uy * uy + c1) * (vx + vy + c2))
+    return float(s.mean(dtype=np.float64))
+
+
+def ssim_batch(images1, images2, win_size=7, data_range=255.0):
+    """
+    一批图片对的 SSIM，images1/images2 是灰度图列表（或 (N, H, W) 数组），返回 N 个分数。
+    和 skimage.metrics.structural_similarity 的默认参数一样（7x7 均值窗口、K1=0.01、K2=0.03、
+    样本协方差、去掉边缘一圈再取平均）。逐对用 float32 + cv2.blur 算，临时数组只有一对图那么大
+    （256x256 时每个约 256 KB），和 float64 的结果差别在 1e-5 以内。
+    """
+    return np.array([_ssim_one(x, y, win_size, data_range) for x, y in zip(images1, images2)])
+
+
+def ssim_pairs(pairs, thumbs, workers=SSIM_WORKERS, batch=SSIM_BATCH):
+    """按批并行算 pairs 里每一对的 SSIM；任意一张读不了的那一对记 0"""
+    scores = np.zeros(len(pairs))
+    valid = [i for i, (a, b) in enumerate(pairs) if a in thumbs and b in thumbs]
+
+    def run(chunk):
+        scores[chunk] = ssim_batch([thumbs[pairs[i][0]] for i in chunk], [thumbs[pairs[i][1]] for i in chunk])
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(run, [valid[i:i + batch] for i in range(0, len(valid), batch)]))
+    return scores
+
+
+def _load_gray(path, kind):
+    img = load_thumbnail(path, _INPUT_SIZE[kind])
+    return None if img is None else to_gray(img, kind)
+
+
+def hash_files(paths, kind="ahash", workers=NUM_WORKERS, use_cache=True):
+    """
+    一批图片文件的哈希，返回 (hashes, ok)：hashes 是 uint64 数组，ok 标记哪些读成功了（读不了的哈希是 0）。
+    解码在线程池里并行；use_cache=True 时文件没变就直接用 hash_cache 里的结果，只解码新增/改过的图片。
+    """
+    paths = list(paths)
+    hashes = np.zeros(len(paths), dtype=np.uint64)
+    ok = np.zeros(len(paths), dtype=bool)
+    cache = default_cache() if use_cache else None
+    cache_kind = _CACHE_KIND[kind]
+
+    todo = []
+    for i, path in enumerate(paths):
+        if cache is not None:
+            try:
+                hit, value = cache.lookup(path, cache_kind)
+            except OSError:
+                continue
+            if hit:
+                hashes[i], ok[i] = int(value), True
+                continue
+        todo.append(i)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(todo), BATCH_SIZE):
+            batch = todo[start:start + BATCH_SIZE]
+            grays = list(pool.map(lambda i: _load_gray(paths[i], kind), batch))
+            good = [i for i, g in zip(batch, grays) if g is not None]
+            values = hash_grays([g for g in grays if g is not None], kind)
+            hashes[good] = values
+            ok[good] = True
+            if cache is not None:
+                for i, value in zip(good, values):
+                    cache.store(paths[i], cache_kind, str(int(value)))
+    return hashes, ok
+
+
+class HammingIndex:
+    """
+    64 位哈希的近邻索引（multi-index hashing）：把哈希切成 chunks 段（默认 4 段 × 16 位），
+    每段各建一张排好序的表。两个哈希距离 <= r 时，按抽屉原理至少有一段的差异 <= r // chunks 位，
+    所以只要在每段表里找"差异不超过 r // chunks 位"的候选，再精确算一次距离就行，不用两两全比。
+
+        index = HammingIndex(train_hashes)
+        index.add(more_hashes)                        # 可以随时追加
+        qi, ii, dist = index.query(val_hashes, 5)     # 所有距离 <= 5 的 (val 下标, train 下标, 距离)
+    """
+
+    # 每一块最多展开/比较这么多候选对（控制内存，约几十 MB）
+    MAX_CANDIDATES = 1 << 22
+    # 一个查询的候选超过索引大小的这个比例，就不如直接和整个索引暴力比
+    DENSE_FRACTION = 0.125
+
+    def __init__(self, hashes=None, chunks=4):
+        if 64 % chunks:
+            raise ValueError("chunks 必须能整除 64")
+        self.chunks = chunks
+        self.bits = 64 // chunks
+        self._parts = []
+        self._hashes = np.zeros(0, dtype=np.uint64)
+        self._tables = None
+        if hashes is not None:
+            self.add(hashes)
+
+    def __len__(self):
+        return len(self._hashes) + sum(len(p) for p in self._parts)
+
+    @property
+    def hashes(self):
+        self._build()
+        return self._hashes
+
+    def add(self, hashes):
+        """追加一批哈希，下标接着已有的往后排；排序表在下一次查询时才重建"""
+        self._parts.append(np.asarray(hashes, dtype=np.uint64).reshape(-1))
+        self._tables = None
+
+    def _chunk(self, hashes, c):
+        mask = np.uint64((1 << self.bits) - 1)
+        return (hashes >> np.uint64(c * self.bits)) & mask
+
+    def _build(self):
+        if self._parts:
+            self._hashes = np.concatenate([self._hashes] + self._parts)
+            self._parts = []
+            self._tables = None
+        if self._tables is None:
+            self._tables = []
+            for c in range(self.chunks):
+                keys = self._chunk(self._hashes, c)
+                order = np.argsort(keys, kind="stable")
+                self._tables.append((keys[order], order))
+
+    def _flips(self, k):
+        """所有"最多 k 位为 1"的 bits 位掩码"""
+        masks = [0]
+        frontier = [0]
+        for _ in range(k):
+            frontier = sorted({m | (1 << b) for m in frontier for b in range(self.bits) if not m >> b & 1})
+            masks += frontier
+        return np.asarray(masks, dtype=np.uint64)
+
+    def query_blocks(self, queries, radius, block=4096):
+        """
+        按块产出 queries 里每个哈希在索引里距离 <= radius 的 (查询下标, 索引下标)，块内不保证顺序。
+        先数每个查询在各段表里有多少候选，候选超过索引大小 DENSE_FRACTION 的查询（比如固定机位的近似重复帧，
+        大家的某一段都一样）直接和整个索引 XOR + popcount 暴力比；其余的按候选总数切成不超过 MAX_CANDIDATES 的小块再展开。
+        每一块的内存都有上限，不会随近似重复的多少平方增长。
+        """
+        self._build()
+        queries = np.asarray(queries, dtype=np.uint64).reshape(-1)
+        flips = self._flips(radius // self.chunks)
+        n = len(self._hashes)
+        if n == 0:
+            return
+        for start in range(0, len(queries), block):
+            q = queries[start:start + block]
+            spans = []
+            per_query = np.zeros(len(q), dtype=np.int64)
+            for c, (keys, order) in enumerate(self._tables):
+                probes = (self._chunk(q, c)[:, None] ^ flips[None, :]).reshape(-1)
+                lo = np.searchsorted(keys, probes, side="left").reshape(len(q), -1)
+                counts = np.searchsorted(keys, probes, side="right").reshape(len(q), -1) - lo
+                spans.append((lo, counts, order))
+                per_query += counts.sum(axis=1)
+
+            # 候选太多的查询：暴力比较，每次比较的行数保证 行数 x n 不超过 MAX_CANDIDATES
+            dense = np.flatnonzero(per_query > self.DENSE_FRACTION * n)
+            rows = max(1, self.MAX_CANDIDATES // n)
+            for s in range(0, len(dense), rows):
+                sel = dense[s:s + rows]
+                qi, ii = np.nonzero(hamming_matrix(q[sel], self._hashes) <= radius)
+                yield sel[qi] + start, ii
+
+            # 其余查询按候选数累计切块，每块展开的候选对不超过 MAX_CANDIDATES
+            sparse = np.flatnonzero(per_query <= self.DENSE_FRACTION * n)
+            if not len(sparse):
+                continue
+            cum = np.cumsum(per_query[sparse])
+            part = (cum - per_query[sparse]) // self.MAX_CANDIDATES
+            k = radius // self.chunks
+            for sel in np.split(sparse, np.flatnonzero(np.diff(part)) + 1):
+                for c, (lo, counts, order) in enumerate(spans):
+                    lo_s, counts_s = lo[sel].reshape(-1), counts[sel].reshape(-1)
+                    total = int(counts_s.sum())
+                    if not total:
+                        continue
+                    qi = np.repeat(np.repeat(sel, len(flips)), counts_s)
+                    offsets = np.arange(total) - np.repeat(np.cumsum(counts_s) - counts_s, counts_s)
+                    ii = order[np.repeat(lo_s, counts_s) + offsets]
+                    diff = q[qi] ^ self._hashes[ii]
+                    keep = popcount64(diff) <= radius
+                    # 同一对可能在好几段里都能找到，只在第一个"差异 <= k 位"的段里算，不用排序去重
+                    for earlier in range(c):
+                        keep &= popcount64(self._chunk(diff, earlier)) > k
+                    yield qi[keep] + start, ii[keep]
+
+    def query(self, queries, radius, block=4096):
+        """
+        queries 里每个哈希在索引里距离 <= radius 的所有项。
+        返回三个等长数组 (查询下标, 索引下标, 距离)，按查询下标、索引下标排序。
+        """
+        queries = np.asarray(queries, dtype=np.uint64).reshape(-1)
+        found = list(self.query_blocks(queries, radius, block))
+        if not found:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty
+        qi = np.concatenate([f[0] for f in found]).astype(np.int64)
+        ii = np.concatenate([f[1] for f in found]).astype(np.int64)
+        order = np.lexsort((ii, qi))
+        qi, ii = qi[order], ii[order]
+        return qi, ii, popcount64(queries[qi] ^ self._hashes[ii]).astype(np.int64)
+
+    def query_one(self, h, radius):
+        """单个哈希的近邻：返回 (索引下标数组, 距离数组)"""
+        _, ii, dist = self.query([h], radius)
+        return ii, dist
+
+
+def _merge_edges(labels, a, b):
+    """
+    把边 (a, b) 合并进 labels（每个点指向所在树的根，根是树里最小的下标），向量化的 hook + 指针跳跃，
+    每轮把每条边两端的根挂到较小的那个上，直到这批边两端的根都一样。
+    """
+    while len(a):
+        ra, rb = labels[a], labels[b]
+        differ = ra != rb
+        if not differ.any():
+            return labels
+        a, b, ra, rb = a[differ], b[differ], ra[differ], rb[differ]
+        low = np.minimum(ra, rb)
+        np.minimum.at(labels, np.maximum(ra, rb), low)
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+    return labels
+
+
+def cluster_hashes(hashes, threshold):
+    """
+    按海明距离 <= threshold 连边，返回每个哈希所在连通簇的编号（簇里最小的唯一哈希下标）。
+    哈希完全相同的先合并成一个点，视频静止画面很多时能省掉大量配对。
+    近邻按块查出来就合并进连通簇，不会把所有配对一次攒在内存里，也没有逐对的 Python 循环。
+    """
+    uniq, inverse = np.unique(np.asarray(hashes, dtype=np.uint64), return_inverse=True)
+    labels = np.arange(len(uniq))
+    for qi, ii in HammingIndex(uniq).query_blocks(uniq, threshold):
+        upper = qi < ii
+        labels = _merge_edges(labels, qi[upper], ii[upper])
+    return labels[inverse.reshape(-1)]
+
+
+def anchor_groups(hashes, threshold):
+    """
+    按顺序贪心分组：还没分到组的第一张当锚点，和锚点距离 <= threshold 的都归到它这一组，返回每个哈希的锚点下标。
+    和 cluster_hashes 的单链接不同，组里每一张和锚点的距离都不超过 threshold，不会一张接一张地连下去。
+    hashes 的顺序就是优先级，想保留的排前面；一般先用 cluster_hashes 分出连通簇，再对每个簇调用。
+    """
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    labels = np.full(len(hashes), -1, dtype=np.int64)
+    for i in range(len(hashes)):
+        if labels[i] < 0:
+            close = (labels < 0) & (hamming(hashes, hashes[i]) <= threshold)
+            labels[close] = i
+    return labels
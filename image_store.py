@@ -0,0 +1,225 @@
+"""
+内容寻址的图片仓库：每张图片按内容的 MD5 只存一份，数据集和划分只是清单（view），
+需要的时候再用硬链接或 YOLO 列表文件"变"出来，不再一遍遍复制/移动整个文件夹。
+
+仓库结构：
+    <store>/images/ab/abcdef....jpg     图片本体（文件名就是 MD5）
+    <store>/labels/ab/abcdef....txt     同名 YOLO 标签（Ultralytics 会把路径里的 images 换成 labels 找标签）
+    <store>/catalog.json                MD5 -> 后缀、原来的文件名、来源路径
+    <store>/views/<名字>.json           一个数据集/划分：{子集: [[文件名, MD5], ...]}
+
+用法：
+    python image_store.py add   F:\\store F:\\cattle3\\train_merged_all
+    python image_store.py split F:\\store cattle_v1 --train 0.8 --val 0.1 --seed 42
+    python image_store.py materialize F:\\store cattle_v1 F:\\cattle_train\\v1 --how list
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+
+from link_copy import LINK_MODES, link_or_copy
+from split_data import split_list
+
+IMG_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp'}
+
+
+def file_md5(path, chunk_size=1024 * 1024):
+    """文件内容的 MD5"""
+    h = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _load_json(path, default):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def _dump_json(data, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def object_path(store, digest, ext):
+    return os.path.join(store, "images", digest[:2], digest + ext)
+
+
+def label_path(store, digest):
+    return os.path.join(store, "labels", digest[:2], digest + ".txt")
+
+
+def load_catalog(store):
+    return _load_json(os.path.join(store, "catalog.json"), {})
+
+
+def save_catalog(store, catalog):
+    _dump_json(catalog, os.path.join(store, "catalog.json"))
+
+
+def add_folder(store, folder, mode="auto", catalog=None):
+    """
+    把文件夹里的图片（和同名 .txt 标签）收进仓库，返回 [(文件名, MD5), ...]。
+    仓库和文件夹在同一个分区时默认用硬链接，不占额外空间；内容重复的图片只存一份。
+    """
+    own_catalog = catalog is None
+    if own_catalog:
+        catalog = load_catalog(store)
+
+    entries = []
+    added = 0
+    for entry in os.scandir(folder):
+        ext = os.path.splitext(entry.name)[1].lower()
+        if not entry.is_file() or ext not in IMG_EXTENSIONS:
+            continue
+        digest = file_md5(entry.path)
+        obj = object_path(store, digest, ext)
+        if digest not in catalog:
+            os.makedirs(os.path.dirname(obj), exist_ok=True)
+            link_or_copy(entry.path, obj, mode)
+            catalog[digest] = {"ext": ext, "names": [], "sources": []}
+            added += 1
+        info = catalog[digest]
+        if entry.name not in info["names"]:
+            info["names"].append(entry.name)
+        source = os.path.abspath(entry.path)
+        if source not in info["sources"]:
+            info["sources"].append(source)
+
+        label = os.path.splitext(entry.path)[0] + ".txt"
+        if os.path.exists(label):
+            os.makedirs(os.path.dirname(label_path(store, digest)), exist_ok=True)
+            link_or_copy(label, label_path(store, digest), mode)
+        entries.append((entry.name, digest))
+
+    if own_catalog:
+        save_catalog(store, catalog)
+    print(f"{folder}: {len(entries)} 张，新入库 {added} 张，内容重复 {len(entries) - added} 张")
+    return entries
+
+
+def view_path(store, view):
+    return os.path.join(store, "views", view + ".json")
+
+
+def save_view(store, view, splits):
+    """保存一个 view：{子集名: [[文件名, MD5], ...]}"""
+    _dump_json({"name": view, "created": time.strftime("%Y-%m-%d %H:%M:%S"), "splits": splits},
+               view_path(store, view))
+
+
+def load_view(store, view):
+    data = _load_json(view_path(store, view), None)
+    if data is None:
+        raise FileNotFoundError(f"找不到 view：{view_path(store, view)}")
+    return data["splits"]
+
+
+def make_split_view(store, view, entries=None, train_ratio=0.8, val_ratio=0.1, seed=42, source_view=None):
+    """
+    新建一个 train/val/test 划分，只写一个清单文件，不碰图片。内容相同的图片只保留一份。
+    entries 不给时用 source_view 里的全部图片，再不给就用整个仓库（文件名取第一次入库时的名字）。
+    """
+    if entries is None:
+        if source_view:
+            entries = [tuple(e) for items in load_view(store, source_view).values() for e in items]
+        else:
+            entries = [(info["names"][0], digest) for digest, info in load_catalog(store).items()]
+    # 同一内容只能出现在一个子集里，否则就是数据泄露
+    unique = {}
+    for name, digest in sorted(entries):
+        unique.setdefault(digest, name)
+    entries = sorted((name, digest) for digest, name in unique.items())
+    subsets = split_list(entries, train_ratio, val_ratio, shuffle=True, seed=seed)
+    splits = {name: [list(e) for e in items] for name, items in subsets.items()}
+    save_view(store, view, splits)
+    print(f"view {view}: " + ", ".join(f"{k} {len(v)}" for k, v in splits.items()))
+    return splits
+
+
+def materialize(store, view, out_dir, how="list"):
+    """
+    把 view 变成能直接训练的样子：
+      how="list"：只写 train.txt / val.txt / test.txt（每行一个仓库里图片的绝对路径），毫秒级
+      how=其他：按 link_copy 的方式在 out_dir/images/<子集>/ 和 labels/<子集>/ 下建链接或复制
+    """
+    catalog = load_catalog(store)
+    splits = load_view(store, view)
+    os.makedirs(out_dir, exist_ok=True)
+
+    for subset, items in splits.items():
+        if how == "list":
+            with open(os.path.join(out_dir, f"{subset}.txt"), "w", encoding="utf-8") as f:
+                for _, digest in items:
+                    f.write(os.path.abspath(object_path(store, digest, catalog[digest]["ext"])) + "\n")
+            continue
+
+        img_dir = os.path.join(out_dir, "images", subset)
+        lbl_dir = os.path.join(out_dir, "labels", subset)
+        os.makedirs(img_dir, exist_ok=True)
+        os.makedirs(lbl_dir, exist_ok=True)
+        used = set()
+        for name, digest in items:
+            if name in used:
+                # 不同来源文件夹里的同名图片，加上 MD5 前缀区分
+                stem, ext = os.path.splitext(name)
+                name = f"{stem}_{digest[:8]}{ext}"
+            used.add(name)
+            link_or_copy(object_path(store, digest, catalog[digest]["ext"]), os.path.join(img_dir, name), how)
+            label = label_path(store, digest)
+            if os.path.exists(label):
+                link_or_copy(label, os.path.join(lbl_dir, os.path.splitext(name)[0] + ".txt"), how)
+    print(f"view {view} 已生成到: {out_dir} ({how})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="内容寻址图片仓库：图片只存一份，划分只是清单")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("add", help="把文件夹收进仓库")
+    p.add_argument("store")
+    p.add_argument("folders", nargs="+")
+    p.add_argument("--mode", choices=LINK_MODES, default="auto")
+    p.add_argument("--view", help="同时把这些图片存成一个 view（子集名 all）")
+
+    p = sub.add_parser("split", help="新建一个 train/val/test 划分 view")
+    p.add_argument("store")
+    p.add_argument("view")
+    p.add_argument("--source-view", help="从哪个 view 里划分，不给就是整个仓库")
+    p.add_argument("--train", type=float, default=0.8)
+    p.add_argument("--val", type=float, default=0.1)
+    p.add_argument("--seed", type=int, default=42)
+
+    p = sub.add_parser("materialize", help="把 view 生成为列表文件或链接目录")
+    p.add_argument("store")
+    p.add_argument("view")
+    p.add_argument("out_dir")
+    p.add_argument("--how", choices=("list",) + LINK_MODES, default="list")
+
+    args = parser.parse_args(argv)
+    if args.cmd == "add":
+        catalog = load_catalog(args.store)
+        entries = []
+        for folder in args.folders:
+            entries += add_folder(args.store, folder, args.mode, catalog)
+        save_catalog(args.store, catalog)
+        if args.view:
+            save_view(args.store, args.view, {"all": [list(e) for e in entries]})
+    elif args.cmd == "split":
+        make_split_view(args.store, args.view, train_ratio=args.train, val_ratio=args.val,
+                        seed=args.seed, source_view=args.source_view)
+    else:
+        materialize(args.store, args.view, args.out_dir, args.how)
+
+
+if __name__ == "__main__":
+    main()
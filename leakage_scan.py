@@ -0,0 +1,215 @@
+"""
+train / val / test 数据泄露检查，一次跑完以前 check_overlap.py、md5.py、cleaning_report.py 分别做的事。
+每个文件只扫描一次，按从便宜到贵的顺序逐级检查任意两个子集之间的重复：
+    name    文件名相同（不区分大小写）
+    size    文件大小相同（只是下一级的候选，不算泄露）
+    digest  内容完全相同（MD5，只算大小相同的文件）
+    phash   感知哈希距离 <= PHASH_DISTANCE（内容已经完全相同的不再重复报）
+    ssim    对 phash 找到的图片对算 SSIM，>= SSIM_THRESHOLD 的标为确认
+结果写成 JSON（汇总、每级用时、全部图片对）和 CSV（每行一对）。
+
+用法：
+    python leakage_scan.py F:\\Trackdata\\images -o F:\\Trackdata\\leakage
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from collections import defaultdict
+from itertools import combinations
+
+from image_hash import HammingIndex, hash_files, load_ssim_thumbs, ssim_pairs
+from md5 import duplicate_groups
+
+# ================= 配置区域 =================
+DATASET_DIR = r"F:\Trackdata\images"
+SPLITS = ("train", "val", "test")
+OUTPUT = r"F:\Trackdata\leakage_report"  # 会写出 .json 和 .csv
+
+# pHash 距离不超过这个值算近似重复（0-64）
+PHASH_DISTANCE = 5
+# SSIM 不低于这个值算确认的重复；设为 None 不做 SSIM
+SSIM_THRESHOLD = 0.95
+# ===========================================
+
+IMG_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+TIERS = ("name", "size", "digest", "phash", "ssim")
+
+
+def scan_split(folder):
+    """递归列出一个子集里的所有图片，返回 [(路径, 文件大小), ...]，文件大小来自目录项，不再单独 stat"""
+    images = []
+    stack = [folder]
+    while stack:
+        for entry in os.scandir(stack.pop()):
+            if entry.is_dir():
+                stack.append(entry.path)
+            elif entry.name.lower().endswith(IMG_EXTENSIONS):
+                images.append((entry.path, entry.stat().st_size))
+    return sorted(images)
+
+
+def _cross_pairs(members, split_of, order):
+    """一组文件里属于不同子集的所有 (a, b) 对，a 的子集排在 b 前面"""
+    pairs = []
+    for a, b in combinations(members, 2):
+        if split_of[a] != split_of[b]:
+            if order[split_of[a]] > order[split_of[b]]:
+                a, b = b, a
+            pairs.append((a, b))
+    return pairs
+
+
+def scan_leakage(split_dirs, phash_distance=PHASH_DISTANCE, ssim_threshold=SSIM_THRESHOLD):
+    """
+    split_dirs: {子集名: 文件夹}，按字典顺序两两比较。
+    返回 dict：splits（每个子集的图片数）、tiers（每级用时和找到的数量）、pairs（每一对的详细信息）
+    """
+    order = {name: i for i, name in enumerate(split_dirs)}
+    timings = {}
+    counts = {}
+
+    start = time.time()
+    split_of, sizes = {}, {}
+    for name, folder in split_dirs.items():
+        for path, size in scan_split(folder):
+            split_of[path] = name
+            sizes[path] = size
+    paths = list(split_of)
+    timings["scan"] = time.time() - start
+
+    def multi_split(group):
+        return len({split_of[p] for p in group}) > 1
+
+    pairs = {}
+
+    def report(a, b, **fields):
+        record = pairs.setdefault((a, b), {
+            "a_split": split_of[a], "a": a, "b_split": split_of[b], "b": b,
+            "name": False, "digest": False, "phash_distance": None, "ssim": None, "confirmed": False,
+        })
+        record.update(fields)
+
+    # 1. 文件名
+    start = time.time()
+    by_name = defaultdict(list)
+    for path in paths:
+        by_name[os.path.basename(path).lower()].append(path)
+    name_pairs = [pair for group in by_name.values() if multi_split(group)
+                  for pair in _cross_pairs(group, split_of, order)]
+    for a, b in name_pairs:
+        report(a, b, name=True)
+    timings["name"] = time.time() - start
+    counts["name"] = len(name_pairs)
+
+    # 2. 文件大小：只统计跨子集大小相同的文件数，交给下一级
+    start = time.time()
+    by_size = defaultdict(list)
+    for path in paths:
+        by_size[sizes[path]].append(path)
+    size_candidates = [p for group in by_size.values() if multi_split(group) for p in group]
+    timings["size"] = time.time() - start
+    counts["size"] = len(size_candidates)
+
+    # 3. 内容完全相同（duplicate_groups 内部还会先按首尾采样再筛一次）
+    start = time.time()
+    digest_pairs = set()
+    for digest, group in duplicate_groups(size_candidates, "md5", keep=multi_split).items():
+        for a, b in _cross_pairs(group, split_of, order):
+            digest_pairs.add((a, b))
+            report(a, b, digest=True, md5=digest)
+    timings["digest"] = time.time() - start
+    counts["digest"] = len(digest_pairs)
+
+    # 4. 感知哈希：每张图只解码一次，每个子集建索引，子集两两查近邻
+    start = time.time()
+    hashes, ok = hash_files(paths, "phash")
+    split_index = {}
+    for name in split_dirs:
+        members = [i for i, p in enumerate(paths) if split_of[p] == name and ok[i]]
+        split_index[name] = (members, HammingIndex(hashes[members]))
+    phash_pairs = []
+    for name_a, name_b in combinations(split_dirs, 2):
+        members_a, index_a = split_index[name_a]
+        members_b, _ = split_index[name_b]
+        qi, ii, dist = index_a.query(hashes[members_b], phash_distance)
+        for q, i, d in zip(qi.tolist(), ii.tolist(), dist.tolist()):
+            a, b = paths[members_a[i]], paths[members_b[q]]
+            if (a, b) not in digest_pairs:
+                phash_pairs.append((a, b))
+                report(a, b, phash_distance=d)
+    timings["phash"] = time.time() - start
+    counts["phash"] = len(phash_pairs)
+
+    # 5. SSIM 复核感知哈希找到的图片对
+    start = time.time()
+    confirmed = 0
+    if ssim_threshold is not None and phash_pairs:
+        thumbs = load_ssim_thumbs([p for pair in phash_pairs for p in pair])
+        for pair, score in zip(phash_pairs, ssim_pairs(phash_pairs, thumbs)):
+            pairs[pair]["ssim"] = round(float(score), 4)
+            pairs[pair]["confirmed"] = bool(score >= ssim_threshold)
+            confirmed += pairs[pair]["confirmed"]
+    for pair in digest_pairs:
+        pairs[pair]["confirmed"] = True
+    timings["ssim"] = time.time() - start
+    counts["ssim"] = confirmed
+
+    split_counts = defaultdict(int)
+    for name in split_of.values():
+        split_counts[name] += 1
+    return {
+        "splits": {name: {"dir": folder, "images": split_counts[name]} for name, folder in split_dirs.items()},
+        "settings": {"phash_distance": phash_distance, "ssim_threshold": ssim_threshold},
+        "tiers": {tier: {"seconds": round(timings[tier], 3), "found": counts[tier]} for tier in TIERS},
+        "scan_seconds": round(timings["scan"], 3),
+        "pairs": sorted(pairs.values(), key=lambda r: (r["a_split"], r["b_split"], r["a"], r["b"])),
+    }
+
+
+def write_report(result, output):
+    """写出 <output>.json 和 <output>.csv"""
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output + ".json", "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=1)
+    fields = ["a_split", "a", "b_split", "b", "name", "digest", "md5", "phash_distance", "ssim", "confirmed"]
+    with open(output + ".csv", "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(result["pairs"])
+
+
+def print_summary(result):
+    print("-" * 50)
+    for name, info in result["splits"].items():
+        print(f"{name}: {info['images']} 张  ({info['dir']})")
+    print(f"扫描目录用时 {result['scan_seconds']:.2f}s")
+    for tier, info in result["tiers"].items():
+        print(f"  {tier:<7} 找到 {info['found']:>6}  用时 {info['seconds']:.2f}s")
+    confirmed = sum(1 for r in result["pairs"] if r["confirmed"])
+    print(f"共 {len(result['pairs'])} 对可疑，其中确认重复 {confirmed} 对")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="检查 train/val/test 之间的数据泄露（文件名、大小、MD5、pHash、SSIM）")
+    parser.add_argument("dataset_dir", nargs="?", default=DATASET_DIR, help="下面有 train/val/test 子文件夹的目录")
+    parser.add_argument("--splits", nargs="+", default=list(SPLITS), help="要比较的子文件夹名")
+    parser.add_argument("-o", "--output", default=OUTPUT, help="报告路径（不带后缀，会写 .json 和 .csv）")
+    parser.add_argument("--phash-distance", type=int, default=PHASH_DISTANCE)
+    parser.add_argument("--ssim", type=float, default=SSIM_THRESHOLD, help="SSIM 确认阈值，设为负数不做 SSIM")
+    args = parser.parse_args(argv)
+
+    split_dirs = {name: os.path.join(args.dataset_dir, name) for name in args.splits
+                  if os.path.isdir(os.path.join(args.dataset_dir, name))}
+    if len(split_dirs) < 2:
+        print(f"❌ {args.dataset_dir} 下至少要有两个子集文件夹：{args.splits}")
+        return
+    result = scan_leakage(split_dirs, args.phash_distance, args.ssim if args.ssim >= 0 else None)
+    write_report(result, args.output)
+    print_summary(result)
+    print(f"报告: {args.output}.json / {args.output}.csv")
+
+
+if __name__ == "__main__":
+    main()
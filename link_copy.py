@@ -0,0 +1,79 @@
+import os
+import shutil
+import sys
+
+# 可选的"复制"方式：
+#   copy      真复制（原来的 shutil.copy2）
+#   hardlink  硬链接：同一个分区内只加一个目录项，不占额外空间，删掉任意一个另一个还在
+#   reflink   写时复制克隆（Linux btrfs/xfs 等支持）：不占额外空间，以后改动互不影响
+#   symlink   软链接：跨分区也能用，但源文件被删/移动后链接会失效（Windows 需要管理员或开发者模式）
+#   auto      依次尝试 hardlink → reflink，都不行（比如跨分区）再真复制
+LINK_MODES = ("copy", "hardlink", "reflink", "symlink", "auto")
+
+# Linux 的 FICLONE ioctl 号
+_FICLONE = 0x40049409
+
+
+def _reflink(src, dst):
+    if not sys.platform.startswith("linux"):
+        raise OSError("当前系统不支持 reflink")
+    import fcntl
+
+    with open(src, "rb") as fs, open(dst, "xb") as fd:
+        try:
+            fcntl.ioctl(fd.fileno(), _FICLONE, fs.fileno())
+        except OSError:
+            fd.close()
+            os.remove(dst)
+            raise
+    shutil.copystat(src, dst)
+
+
+_METHODS = {
+    "hardlink": os.link,
+    "reflink": _reflink,
+    "symlink": lambda src, dst: os.symlink(os.path.abspath(src), dst),
+}
+
+
+def _place(src, dst, mode, fresh):
+    tries = ("hardlink", "reflink") if mode == "auto" else (mode,)
+    for method in tries:
+        if method == "copy":
+            break
+        try:
+            _METHODS[method](src, dst)
+            return method
+        except FileExistsError:
+            raise
+        except (OSError, NotImplementedError, AttributeError):
+            continue
+
+    # copy2 遇到已有的 dst 会直接覆盖（软链接还会写穿到它指向的文件），fresh 时交给调用方按已存在处理
+    if fresh and os.path.lexists(dst):
+        raise FileExistsError(dst)
+    shutil.copy2(src, dst)
+    return "copy"
+
+
+def link_or_copy(src, dst, mode="auto", fresh=False):
+    """
+    按 mode 把 src 放到 dst（dst 已存在会被覆盖，和 shutil.copy2 一样），
+    链接失败时自动退回真复制。返回实际用的方式："hardlink" / "reflink" / "symlink" / "copy"
+    fresh=True 表示调用方已经保证 dst 是新名字（比如合并时在内存里查过重名），不先 lexists 探一次，
+    直接建链接；万一 dst 其实已经有了（FileExistsError），再按普通方式覆盖。
+    """
+    if mode not in LINK_MODES:
+        raise ValueError(f"不支持的方式：{mode}，可选 {LINK_MODES}")
+
+    if fresh:
+        try:
+            return _place(src, dst, mode, fresh=True)
+        except FileExistsError:
+            pass
+
+    if os.path.lexists(dst):
+        if mode != "copy" and os.path.exists(dst) and os.path.samefile(src, dst):
+            return mode if mode != "auto" else "hardlink"
+        os.remove(dst)
+    return _place(src, dst, mode, fresh=False)
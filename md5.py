@@ -1,62 +1,142 @@
 import os
 import hashlib
 import shutil
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from hash_cache import cached_hash
+
+# 读文件的缓冲区大小；hashlib 处理大块数据时会释放 GIL，多线程能真正并行
+BUFFER_SIZE = 1024 * 1024
+# 大文件先比较开头和结尾各这么多字节，不一样就不用读完整个文件
+SAMPLE_SIZE = 64 * 1024
+# 并行读文件/算哈希的线程数
+NUM_WORKERS = min(32, (os.cpu_count() or 4) * 2)
+
+IMG_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+def _new_hasher(algo):
+    """
+    可选的摘要算法：md5（默认，和以前的报告、缓存兼容）、blake2b（标准库自带，比 md5 快）、
+    xxh64 / xxh3（最快，需要 pip install xxhash）
+    """
+    if algo == "md5":
+        return hashlib.md5()
+    if algo == "blake2b":
+        return hashlib.blake2b(digest_size=16)
+    if algo in ("xxh64", "xxh3"):
+        import xxhash
+        return xxhash.xxh64() if algo == "xxh64" else xxhash.xxh3_128()
+    raise ValueError(f"不支持的摘要算法：{algo}")
+
+
+def _digest_of_file(file_path, algo="md5"):
+    hasher = _new_hasher(algo)
+    buf = bytearray(BUFFER_SIZE)
+    view = memoryview(buf)
+    with open(file_path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            hasher.update(view[:n])
+    return hasher.hexdigest()
+
+
+def file_digest(file_path, algo="md5"):
+    """整个文件的摘要（文件没变时直接用 hash_cache 里缓存的结果）"""
+    return cached_hash(file_path, algo, lambda p: _digest_of_file(p, algo))
+
+
+def _sample_digest(file_path, size):
+    """文件开头和结尾各 SAMPLE_SIZE 字节的摘要，只用来快速排除内容不同的文件"""
+    hasher = hashlib.blake2b(digest_size=16)
+    with open(file_path, "rb") as f:
+        hasher.update(f.read(SAMPLE_SIZE))
+        f.seek(size - SAMPLE_SIZE)
+        hasher.update(f.read(SAMPLE_SIZE))
+    return hasher.hexdigest()
 
 
 def calculate_md5(file_path):
-    """计算文件的MD5哈希值"""
-    hash_md5 = hashlib.md5()
+    """计算文件的MD5哈希值（文件没变时直接用 hash_cache 里缓存的结果）"""
     try:
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
+        return file_digest(file_path, "md5")
     except Exception as e:
         print(f"Error reading {file_path}: {e}")
         return None
 
 
-def find_exact_duplicates_by_md5(train_dir, val_dir):
-    """使用MD5找到完全相同的文件"""
-    train_md5 = {}
-    val_md5 = {}
-
-    print("Calculating MD5 for training images...")
-    train_count = 0
-    for root, dirs, files in os.walk(train_dir):
-        for file in files:
-            if file.lower().endswith(('.png', '.jpg', '.jpeg')):
-                path = os.path.join(root, file)
-                md5_val = calculate_md5(path)
-                if md5_val:
-                    train_md5[md5_val] = path
-                train_count += 1
-                if train_count % 100 == 0:
-                    print(f"Processed {train_count} training images...")
-
-    print("Calculating MD5 for validation images...")
-    val_count = 0
-    for root, dirs, files in os.walk(val_dir):
-        for file in files:
-            if file.lower().endswith(('.png', '.jpg', '.jpeg')):
-                path = os.path.join(root, file)
-                md5_val = calculate_md5(path)
-                if md5_val:
-                    val_md5[md5_val] = path
-                val_count += 1
-                if val_count % 100 == 0:
-                    print(f"Processed {val_count} validation images...")
-
-    # 找到MD5相同的文件
-    train_md5_set = set(train_md5.keys())
-    val_md5_set = set(val_md5.keys())
-    exact_duplicates_md5 = train_md5_set.intersection(val_md5_set)
-
-    exact_duplicates = [val_md5[md5] for md5 in exact_duplicates_md5]
+def _refine(groups, key_func, keep, workers):
+    """把每组里的文件按 key_func 再细分，只留下 keep(组) 为真的组；读不了的文件直接丢掉"""
+    paths = [p for group in groups for p in group]
+
+    def safe_key(path):
+        try:
+            return key_func(path)
+        except OSError as e:
+            print(f"Error reading {path}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        keys = pool.map(safe_key, paths)
+        new_groups = defaultdict(list)
+        for path, key in zip(paths, keys):
+            if key is not None:
+                new_groups[key].append(path)
+    return {key: group for key, group in new_groups.items() if keep(group)}
+
+
+def duplicate_groups(paths, algo="md5", workers=NUM_WORKERS, keep=None):
+    """
+    找出内容完全相同的文件，返回 {摘要: [路径, ...]}，每组至少两个文件。
+    依次用 文件大小 → 开头/结尾采样 → 完整摘要 分组，每一步只把还可能重复的文件交给下一步：
+    大小独一无二的文件一个字节都不读，大文件采样不同的也不用读完。
+    keep(组) 决定一组要不要留下，默认是组里至少两个文件（比如只关心跨 train/val 的重复时可以改）。
+    """
+    keep = keep or (lambda group: len(group) > 1)
+
+    by_size = defaultdict(list)
+    for path in paths:
+        try:
+            by_size[os.path.getsize(path)].append(path)
+        except OSError as e:
+            print(f"Error reading {path}: {e}")
+    groups = {size: group for size, group in by_size.items() if keep(group)}
+
+    # 小文件采样就等于读整个文件，直接算完整摘要
+    small = [group for size, group in groups.items() if size <= 2 * SAMPLE_SIZE]
+    sizes = {p: size for size, group in groups.items() if size > 2 * SAMPLE_SIZE for p in group}
+    large = _refine([list(sizes)], lambda p: (sizes[p], _sample_digest(p, sizes[p])), keep, workers)
+
+    return _refine(small + list(large.values()), lambda p: file_digest(p, algo), keep, workers)
+
+
+def list_images(folder):
+    return [os.path.join(root, file)
+            for root, dirs, files in os.walk(folder)
+            for file in files if file.lower().endswith(IMG_EXTENSIONS)]
+
+
+def find_exact_duplicates_by_md5(train_dir, val_dir, algo="md5", workers=NUM_WORKERS):
+    """使用MD5找到完全相同的文件（algo 可以换成 blake2b / xxh64，结果一样，只是更快）"""
+    print("Listing training and validation images...")
+    train_paths = list_images(train_dir)
+    val_paths = list_images(val_dir)
+    train_set = set(train_paths)
+
+    # 只关心 train 和 val 之间的重复，组里两边都有文件才继续往下算
+    def cross(group):
+        return any(p in train_set for p in group) and any(p not in train_set for p in group)
+
+    print(f"Hashing duplicate candidates with {algo} ({workers} threads)...")
+    groups = duplicate_groups(train_paths + val_paths, algo, workers, keep=cross)
+    exact_duplicates = sorted(p for group in groups.values() for p in group if p not in train_set)
 
     print(f"\n=== MD5 Exact Duplicate Analysis ===")
-    print(f"Training images: {len(train_md5)}")
-    print(f"Validation images: {len(val_md5)}")
+    print(f"Training images: {len(train_paths)}")
+    print(f"Validation images: {len(val_paths)}")
     print(f"Exact duplicates (MD5 match): {len(exact_duplicates)}")
 
     return exact_duplicates
@@ -69,6 +149,7 @@ def create_md5_clean_validation_set(train_dir, val_dir, output_dir):
 
     # 找到完全相同的文件
     exact_duplicates = find_exact_duplicates_by_md5(train_dir, val_dir)
+    duplicate_set = set(exact_duplicates)
 
     # 创建输出目录
     os.makedirs(output_dir, exist_ok=True)
@@ -84,7 +165,7 @@ def create_md5_clean_validation_set(train_dir, val_dir, output_dir):
                 source_path = os.path.join(root, file)
 
                 # 如果这个图像不在完全重复列表中，就复制它
-                if source_path not in exact_duplicates:
+                if source_path not in duplicate_set:
                     dest_path = os.path.join(output_dir, file)
                     shutil.copy2(source_path, dest_path)
                     copied_count += 1
@@ -1,6 +1,7 @@
 import os
 import random
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 
 # ================= 配置区域 =================
 # 1. 你现在存放大批量图片的文件夹
@@ -12,8 +13,76 @@ TARGET_DIR = r"F:\cattle2\to_label_100"
 
 # 3. 抽取数量
 PICK_NUM = 100
+
+# 4. 随机种子，固定以后每次抽到的都一样；None 表示每次都随机
+SEED = None
+
+# 5. 不参与抽取的图片：可以是文件夹（里面的图片名，比如已经标注过的）或 .txt 清单（每行一个文件名）
+EXCLUDE = []  # 例如 [r"F:\cattle2\labeled", r"F:\cattle2\picked_before.txt"]
+
+# 6. 同时移动文件的线程数
+NUM_WORKERS = 8
 # ===========================================
 
+VALID_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp'}
+
+
+def iter_images(folder):
+    """一边读目录一边产出图片文件名，不把整个目录列表放进内存"""
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if os.path.splitext(entry.name)[1].lower() in VALID_EXTENSIONS and entry.is_file():
+                yield entry.name
+
+
+def load_exclusions(sources):
+    """把 EXCLUDE 里的文件夹/清单读成一个文件名集合（不区分大小写时按系统规则统一）"""
+    names = set()
+    for src in sources:
+        if os.path.isdir(src):
+            names.update(os.path.normcase(n) for n in iter_images(src))
+        elif os.path.isfile(src):
+            with open(src, "r", encoding="utf-8") as f:
+                names.update(os.path.normcase(os.path.basename(line.strip())) for line in f if line.strip())
+        else:
+            print(f"警告：找不到排除列表 {src}，已忽略")
+    return names
+
+
+def reservoir_sample(items, k, seed=None):
+    """
+    蓄水池抽样：只遍历一遍，从任意长的序列里等概率抽 k 个，内存只占 k 个。
+    返回 (抽中的列表, 一共看了多少个)。
+    """
+    rng = random.Random(seed)
+    reservoir = []
+    n = 0
+    for n, item in enumerate(items, 1):
+        if n <= k:
+            reservoir.append(item)
+        else:
+            j = rng.randrange(n)
+            if j < k:
+                reservoir[j] = item
+    return reservoir, n
+
+
+def move_files(names, src_dir, dst_dir, num_workers=NUM_WORKERS):
+    """用线程池批量移动，返回成功移动的个数"""
+    def move(name):
+        try:
+            # 使用 move (剪切)，这样原来的文件夹里剩下的就是未标注的，方便后续管理
+            # 如果你只想复制，把 shutil.move 改成 shutil.copy2
+            shutil.move(os.path.join(src_dir, name), os.path.join(dst_dir, name))
+            return True
+        except Exception as e:
+            print(f"移动失败 {name}: {e}")
+            return False
+
+    with ThreadPoolExecutor(max_workers=num_workers) as pool:
+        return sum(pool.map(move, names))
+
+
 def move_random_images():
     # 检查源文件夹是否存在
     if not os.path.exists(SOURCE_DIR):
@@ -25,41 +94,21 @@ def move_random_images():
         os.makedirs(TARGET_DIR)
         print(f"已创建目标文件夹: {TARGET_DIR}")
 
-    # 1. 扫描所有图片
-    print("正在扫描图片...")
-    valid_extensions = {'.jpg', '.jpeg', '.png', '.bmp'}
-    all_images = []
-    
-    for f in os.listdir(SOURCE_DIR):
-        ext = os.path.splitext(f)[1].lower()
-        if ext in valid_extensions:
-            all_images.append(f)
-
-    total_count = len(all_images)
-    print(f"源文件夹共有 {total_count} 张图片。")
+    # 1. 扫描目录的同时抽样（只扫一遍，不建完整列表）
+    excluded = load_exclusions(EXCLUDE)
+    if excluded:
+        print(f"排除列表共 {len(excluded)} 个文件名。")
+    print(f"正在扫描并随机抽取 {PICK_NUM} 张...")
+    candidates = (name for name in iter_images(SOURCE_DIR) if os.path.normcase(name) not in excluded)
+    selected_images, total_count = reservoir_sample(candidates, PICK_NUM, SEED)
+    print(f"源文件夹共有 {total_count} 张可抽取的图片。")
 
     if total_count < PICK_NUM:
         print(f"警告：图片总数 ({total_count}) 少于你要抽取的数量 ({PICK_NUM})！")
         print("将移动所有图片。")
-        selected_images = all_images
-    else:
-        # 2. 核心步骤：随机打乱并抽取
-        print(f"正在随机抽取 {PICK_NUM} 张...")
-        selected_images = random.sample(all_images, PICK_NUM)
-
-    # 3. 执行移动操作
-    count = 0
-    for image_name in selected_images:
-        src_path = os.path.join(SOURCE_DIR, image_name)
-        dst_path = os.path.join(TARGET_DIR, image_name)
 
-        try:
-            # 使用 move (剪切)，这样原来的文件夹里剩下的就是未标注的，方便后续管理
-            # 如果你只想复制，把 shutil.move 改成 shutil.copy2
-            shutil.move(src_path, dst_path)
-            count += 1
-        except Exception as e:
-            print(f"移动失败 {image_name}: {e}")
+    # 2. 并行移动
+    count = move_files(selected_images, SOURCE_DIR, TARGET_DIR)
 
     print("-" * 30)
     print(f"成功！已随机抽取并移动了 {count} 张图片。")
@@ -67,4 +116,4 @@ def move_random_images():
     print(f"👉 {TARGET_DIR}")
 
 if __name__ == '__main__':
-    move_random_images()
\ No newline at end of file
+    move_random_images()
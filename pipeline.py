@@ -0,0 +1,226 @@
+"""
+流式数据集构建：抽帧 → 去重 → 重命名 → 打乱 → 划分 一次完成。
+以前每一步都要把整个图片集读一遍、写一份新拷贝（hebing2 → quchong2 → daluan → split_data），
+这里每一步都是一个生成器，处理的是内存里的记录，只有最后保留下来的图片才真正写一次盘。
+
+记录是一个 dict：
+    name   当前文件名（hebing2 规则：文件夹名_原文件名）
+    src    源图片路径（来自已抽好帧的文件夹时）
+    data   编码好的图片字节（直接从视频抽帧时，没有 src）
+    label  同名的 YOLO 标签 .txt 路径（没有就是 None）
+"""
+import csv
+import hashlib
+import os
+import shutil
+import time
+
+import cv2
+import numpy as np
+
+from daluan import make_shuffle_plan
+from hebing2 import iter_source_images
+from image_hash import hamming
+from split_data import split_list
+
+# ================= 配置区域 =================
+# 数据来源二选一：
+# 1. 视频文件夹（直接从视频抽帧，帧只在内存里编码一次）
+VIDEO_DIRS = []  # 例如 [r"G:\2023.11.09", r"G:\2023.11.10"]
+INTERVAL_SEC = 120
+# 2. 已经抽好帧的大文件夹（和 hebing2.py 一样，扫描下面的所有子文件夹）
+SOURCE_DIR = r"F:\dataset"
+
+# 最终的 YOLO 数据集文件夹（images/{train,val,test} + labels/{train,val,test}）
+TARGET_DIR = r"F:\cattle_train\YOLO_Dataset_Formatted_WithTest"
+
+# pHash 相似度阈值 (0-64)，和 quchong2.py 一样，视频抽帧建议 2 或 3；设为 None 不做相似去重
+SIMILARITY_THRESHOLD = 3
+
+# 重命名前缀，和 daluan.py 一样
+PREFIX = "cattle"
+
+# 划分比例，和 split_data.py 一样
+TRAIN_RATIO = 0.8
+VAL_RATIO = 0.1
+
+# 随机种子，固定以后每次打乱/划分的结果都一样
+SEED = 42
+# ===========================================
+
+# 视频帧在划分之前先写到目标文件夹下的这个暂存目录，划分完再挪到最终位置
+STAGING_NAME = ".pipeline_staging"
+
+
+def source_images(source_dir):
+    """阶段 1a：已经抽好的帧"""
+    for src, name in iter_source_images(source_dir):
+        label = os.path.splitext(src)[0] + ".txt"
+        yield {"name": name, "src": src, "label": label if os.path.exists(label) else None}
+
+
+def source_videos(video_dirs, interval_sec):
+    """阶段 1b：直接从视频抽帧，编码成 jpg 字节留在内存里"""
+    from LeNet.cattle import iter_video_frames, list_videos
+
+    for video_path in list_videos(video_dirs):
+        stem = os.path.splitext(os.path.basename(video_path))[0]
+        for i, (frame_idx, frame) in enumerate(iter_video_frames(video_path, interval_sec)):
+            ok, buf = cv2.imencode(".jpg", frame)
+            if ok:
+                yield {"name": f"{stem}_frame_{i:05d}.jpg", "data": buf.tobytes(), "label": None,
+                       "video": video_path, "frame_idx": frame_idx}
+
+
+def _read_bytes(record):
+    if "data" in record:
+        return record["data"]
+    with open(record["src"], "rb") as f:
+        return f.read()
+
+
+def dedup_exact(records, stats):
+    """
+    阶段 2：MD5 完全相同的只留第一张（quchong2 第一步）。
+    读出来的字节暂存在 record["_buf"] 里给下一阶段算 pHash，每张源图只读一次。
+    """
+    seen = set()
+    for record in records:
+        data = _read_bytes(record)
+        digest = hashlib.md5(data).hexdigest()
+        if digest in seen:
+            stats["exact"] += 1
+            continue
+        seen.add(digest)
+        record["_buf"] = data
+        yield record
+
+
+def _phash(phasher, data):
+    """pHash：和 quchong2 第二步一样用 imagededup 的 PHash，返回 64 位整数"""
+    img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        return None
+    return int(phasher.encode_image(image_array=cv2.cvtColor(img, cv2.COLOR_BGR2RGB)), 16)
+
+
+def dedup_visual(records, threshold, stats):
+    """阶段 3：和已经保留的任意一张 pHash 距离 <= threshold 的丢掉（quchong2 第二步）"""
+    from imagededup.methods import PHash
+
+    phasher = PHash()
+    kept = np.zeros(1024, dtype=np.uint64)
+    n = 0
+    for record in records:
+        h = _phash(phasher, record.get("_buf") or _read_bytes(record))
+        if h is None:
+            stats["unreadable"] += 1
+            continue
+        if n and hamming(kept[:n], h).min() <= threshold:
+            stats["visual"] += 1
+            continue
+        if n == len(kept):
+            kept = np.concatenate([kept, np.zeros_like(kept)])
+        kept[n] = h
+        n += 1
+        yield record
+
+
+def unique_names(records):
+    """阶段 4：保证名字不重复，重名时和 hebing2 一样加 _1、_2 后缀（只在内存里查）"""
+    used = set()
+    for record in records:
+        stem, ext = os.path.splitext(record["name"])
+        name, k = record["name"], 1
+        while name in used:
+            name = f"{stem}_{k}{ext}"
+            k += 1
+        used.add(name)
+        record["name"] = name
+        yield record
+
+
+def materialize(records, target_dir, prefix, train_ratio, val_ratio, seed):
+    """
+    阶段 5：打乱重命名（daluan）+ 划分（split_data），每张保留的图片只写一次盘。
+    打乱和划分需要知道总数，所以这里要先收集所有记录，但只留名字和路径：
+    来自视频的帧到达时就把字节写进目标文件夹下的暂存目录，最后 os.replace 挪到最终位置（同一分区只改目录项），
+    内存不随保留的帧数增长；来自文件夹的记录最后直接从源路径复制。
+    同时写出 pipeline_names.csv（新名字 → 子集、旧名字、来源），方便追溯。
+    """
+    # 上次中途失败留下的暂存目录先清掉，残留的帧不会混进这次的结果
+    staging_dir = os.path.join(target_dir, STAGING_NAME)
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    os.makedirs(staging_dir)
+    by_name = {}
+    total_bytes = 0
+    for record in records:
+        record.pop("_buf", None)
+        if "data" in record:
+            staged = os.path.join(staging_dir, record["name"])
+            with open(staged, "wb") as f:
+                f.write(record["data"])
+            total_bytes += len(record.pop("data"))
+            record["staged"] = staged
+        by_name[record["name"]] = record
+    plan = dict(make_shuffle_plan(by_name, prefix=prefix, seed=seed))
+    subsets = split_list(sorted(by_name), train_ratio, val_ratio, shuffle=True, seed=seed)
+
+    written = {}
+    for subset, names in subsets.items():
+        img_dir = os.path.join(target_dir, "images", subset)
+        label_dir = os.path.join(target_dir, "labels", subset)
+        os.makedirs(img_dir, exist_ok=True)
+        os.makedirs(label_dir, exist_ok=True)
+        for old_name in names:
+            record = by_name[old_name]
+            new_name = plan[old_name]
+            dst = os.path.join(img_dir, new_name)
+            if "staged" in record:
+                os.replace(record["staged"], dst)
+            else:
+                shutil.copy2(record["src"], dst)
+                total_bytes += os.path.getsize(dst)
+            if record["label"]:
+                shutil.copy2(record["label"], os.path.join(label_dir, os.path.splitext(new_name)[0] + ".txt"))
+        written[subset] = len(names)
+    shutil.rmtree(staging_dir)
+
+    # 新旧名字对照表，方便以后追溯每张图的来源（路径里可能有逗号，用 csv 模块转义）
+    with open(os.path.join(target_dir, "pipeline_names.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["new_name", "subset", "old_name", "source"])
+        for subset, names in subsets.items():
+            for old_name in names:
+                record = by_name[old_name]
+                source = record.get("src") or f"{record['video']}#{record['frame_idx']}"
+                writer.writerow([plan[old_name], subset, old_name, source])
+    return written, total_bytes
+
+
+def build_dataset(video_dirs=VIDEO_DIRS, source_dir=SOURCE_DIR, target_dir=TARGET_DIR,
+                  threshold=SIMILARITY_THRESHOLD, prefix=PREFIX,
+                  train_ratio=TRAIN_RATIO, val_ratio=VAL_RATIO, seed=SEED):
+    """把各阶段串起来跑一遍，返回各子集写出的张数"""
+    start = time.time()
+    stats = {"exact": 0, "visual": 0, "unreadable": 0}
+
+    records = source_videos(video_dirs, INTERVAL_SEC) if video_dirs else source_images(source_dir)
+    records = dedup_exact(records, stats)
+    if threshold is not None:
+        records = dedup_visual(records, threshold, stats)
+    records = unique_names(records)
+    written, total_bytes = materialize(records, target_dir, prefix, train_ratio, val_ratio, seed)
+
+    elapsed = max(time.time() - start, 1e-6)
+    print("-" * 40)
+    print(f"完全重复丢弃: {stats['exact']}，视觉相似丢弃: {stats['visual']}，无法读取: {stats['unreadable']}")
+    for subset, count in written.items():
+        print(f"{subset}: {count} 张")
+    print(f"共写出 {sum(written.values())} 张, {total_bytes / 1024 / 1024:.1f} MB, 用时 {elapsed:.1f}s")
+    print(f"数据集位置: {target_dir}")
+    return written
+
+
+if __name__ == '__main__':
+    build_dataset()
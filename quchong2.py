@@ -1,7 +1,11 @@
 import os
 import shutil
-import hashlib
-from imagededup.methods import PHash
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from image_hash import anchor_groups, cluster_hashes, hash_files, sharpness
+from md5 import duplicate_groups, file_digest
 
 # ================= 配置区域 =================
 # 你的数据集路径
@@ -14,7 +18,16 @@ BACKUP_DIR = os.path.join(WORK_DIR, "duplicates_backup")
 # 视频抽帧建议设为 2 或 3。
 # 0代表完全一样，数值越小越严格。
 # 设为 3 意味着允许非常细微的差异（比如光照微变、噪点），这对于视频帧去重很有效。
+# pHash 用的是 image_hash 里和 imagededup PHash 相同的定义（不归一化 DCT、中位数不算直流分量），
+# 只是按 1/2~1/8 缩小解码、用 INTER_AREA 缩放，和 imagededup 算出来的大多一样、少数差 2 位。
+# 每张被移走的图和它的保留图距离都 <= 这个值（以保留图为中心分组，不会一串串连下去）。
 SIMILARITY_THRESHOLD = 3 
+
+# 每个相似簇保留哪一张："earliest"（文件名最靠前）、"largest"（文件最大）、"sharpest"（最清晰）
+REPRESENTATIVE = "earliest"
+
+# 计算清晰度、移动文件的线程数
+NUM_WORKERS = 8
 # ===========================================
 
 def ensure_dir(path):
@@ -22,86 +35,112 @@ def ensure_dir(path):
         os.makedirs(path)
 
 def get_md5(file_path):
-    """计算文件的MD5值"""
-    with open(file_path, "rb") as f:
-        return hashlib.md5(f.read()).hexdigest()
+    """计算文件的MD5值（分块读，文件没变时直接用 hash_cache 里缓存的结果）"""
+    return file_digest(file_path, "md5")
 
 def step1_remove_exact_duplicates():
     print(">>> 第一步：正在扫描完全重复的文件 (MD5)...")
     exact_dir = os.path.join(BACKUP_DIR, "exact_copies")
     ensure_dir(exact_dir)
     
-    seen_hashes = {}
     count = 0
     
     # 获取所有图片
     all_files = [f for f in os.listdir(WORK_DIR) if f.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp'))]
+    all_paths = [os.path.join(WORK_DIR, f) for f in all_files]
+    all_paths = [p for p in all_paths if os.path.isfile(p)]
     
-    for file in all_files:
-        path = os.path.join(WORK_DIR, file)
-        if not os.path.isfile(path): continue
-        
-        file_hash = get_md5(path)
-        
-        if file_hash in seen_hashes:
-            # 发现重复，移走
-            shutil.move(path, os.path.join(exact_dir, file))
+    # 先按文件大小、再按首尾采样筛，只有可能重复的才算完整 MD5（多线程）
+    order = {path: i for i, path in enumerate(all_paths)}
+    for group in duplicate_groups(all_paths, "md5").values():
+        # 保留扫描顺序里的第一张，其余移走
+        for path in sorted(group, key=order.get)[1:]:
+            shutil.move(path, os.path.join(exact_dir, os.path.basename(path)))
             count += 1
-            # print(f"移走完全重复: {file}")
-        else:
-            seen_hashes[file_hash] = file
+            # print(f"移走完全重复: {os.path.basename(path)}")
             
     print(f"    [完成] 移除了 {count} 张完全一模一样的图片。\n")
 
+def rank_members(clusters, policy=REPRESENTATIVE):
+    """
+    每个簇（文件名列表）按保留的优先级排好序返回，排第一的最该保留。
+    earliest: 文件名最靠前（视频帧的名字按时间排，就是最早的一帧）
+    largest:  文件最大（同样内容下 JPEG 越大细节越多）
+    sharpest: 最清晰（拉普拉斯方差最大），需要解码每个簇里的图片
+    打平时都按文件名取靠前的，结果每次都一样。
+    """
+    if policy == "earliest":
+        return [sorted(files) for files in clusters]
+    if policy == "largest":
+        return [sorted(files, key=lambda f: (-os.path.getsize(os.path.join(WORK_DIR, f)), f)) for files in clusters]
+    if policy == "sharpest":
+        members = [f for files in clusters for f in files]
+        with ThreadPoolExecutor(max_workers=NUM_WORKERS) as pool:
+            scores = dict(zip(members, pool.map(lambda f: sharpness(os.path.join(WORK_DIR, f)), members)))
+        return [sorted(files, key=lambda f: (-scores[f], f)) for files in clusters]
+    raise ValueError(f"不支持的保留策略：{policy}")
+
+def move_files(moves):
+    """用线程池批量移动 [(源, 目标), ...]，返回成功移动的个数"""
+    def move(pair):
+        try:
+            shutil.move(*pair)
+            return True
+        except Exception as e:
+            print(f"移动失败: {os.path.basename(pair[0])} Error: {e}")
+            return False
+
+    with ThreadPoolExecutor(max_workers=NUM_WORKERS) as pool:
+        return sum(pool.map(move, moves))
+
 def step2_remove_visual_duplicates():
-    print(">>> 第二步：正在基于 AI 感知哈希 (pHash) 识别相似图片...")
-    print("    (这一步需要计算每张图的指纹，图片多的话请耐心等待...)")
+    print(">>> 第二步：正在基于感知哈希 (pHash) 识别相似图片...")
+    print("    (这一步需要计算每张图的指纹，算过的图片直接用缓存...)")
     
     visual_dir = os.path.join(BACKUP_DIR, "visual_similar")
     ensure_dir(visual_dir)
 
-    phasher = PHash()
-    
-    # 1. 生成所有图片的编码
-    # imagededup 会自动扫描目录下的图片
-    encodings = phasher.encode_images(image_dir=WORK_DIR)
-    
-    # 2. 查找重复
-    # find_duplicates 返回的是一个字典 {文件名: [重复文件列表]}
-    duplicates = phasher.find_duplicates(encoding_map=encodings, max_distance_threshold=SIMILARITY_THRESHOLD)
+    # 1. 生成所有图片的编码（多线程批量计算，算过的直接从缓存取）
+    files = sorted(f for f in os.listdir(WORK_DIR)
+                   if f.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp')) and os.path.isfile(os.path.join(WORK_DIR, f)))
+    hashes, ok = hash_files([os.path.join(WORK_DIR, f) for f in files], "phash")
+    files = [f for f, good in zip(files, ok) if good]
+    hashes = hashes[ok]
     
-    count = 0
-    processed_files = set() # 记录已经处理过的文件，防止重复操作
-
-    # 3. 处理重复列表
-    # 这种方法会保留列表中的“键”(Key)，移走“值”(Value)里面的文件
-    # 比如 {'A.jpg': ['B.jpg', 'C.jpg']} -> 保留 A，移走 B 和 C
+    # 2. 先按距离 <= 阈值连边分出连通簇（A~B、B~C 时 A、B、C 在一个簇里），只是候选
+    # 用近邻索引找相似对，不用两两比较，20 万张也只要几秒
+    labels = cluster_hashes(hashes, SIMILARITY_THRESHOLD)
+    index_of = {f: i for i, f in enumerate(files)}
+    groups = {}
+    for f, label in zip(files, labels.tolist()):
+        groups.setdefault(label, []).append(f)
+    clusters = [members for members in groups.values() if len(members) > 1]
     
-    # 对文件名排序，保证每次运行结果一致（优先保留名字靠前的）
-    sorted_filenames = sorted(duplicates.keys())
+    # 3. 每个簇按 REPRESENTATIVE 排好优先级，以保留图为中心分组：
+    # 优先级最高的留下，和它距离 <= 阈值的移走；剩下的里面再挑优先级最高的留下……
+    # 这样每张被移走的图都和自己的保留图足够像，缓慢移动的镜头不会整串只剩一张
+    moves = []
+    log_rows = []
+    kept_groups = 0
+    for members in rank_members(clusters, REPRESENTATIVE):
+        anchors = anchor_groups(hashes[[index_of[f] for f in members]], SIMILARITY_THRESHOLD)
+        sizes = np.bincount(anchors)
+        kept_groups += int((sizes > 1).sum())
+        for f, a in zip(members, anchors.tolist()):
+            if f != members[a]:
+                moves.append((os.path.join(WORK_DIR, f), os.path.join(visual_dir, f)))
+                log_rows.append(f"{f},{members[a]},{sizes[a]}\n")
+    count = move_files(moves)
     
-    for filename in sorted_filenames:
-        # 如果这个文件之前被当作别人的重复项移走了，就跳过
-        if filename in processed_files:
-            continue
-            
-        dup_list = duplicates[filename]
-        
-        if dup_list:
-            for dup_file in dup_list:
-                # 构建路径
-                src = os.path.join(WORK_DIR, dup_file)
-                dst = os.path.join(visual_dir, dup_file)
-                
-                if os.path.exists(src):
-                    try:
-                        shutil.move(src, dst)
-                        processed_files.add(dup_file) # 标记这个文件已经被处理（移走）了
-                        count += 1
-                        print(f"移走相似图: {dup_file} (与 {filename} 极度相似)")
-                    except Exception as e:
-                        print(f"移动失败: {dup_file} Error: {e}")
+    # 记录每张被移走的图和它的保留图，方便检查
+    log_path = os.path.join(visual_dir, "visual_clusters.csv")
+    new_log = not os.path.exists(log_path)
+    with open(log_path, "a", encoding="utf-8") as f:
+        if new_log:
+            f.write("moved,kept,cluster_size\n")
+        f.writelines(log_rows)
 
+    print(f"    共 {kept_groups} 组相似图，每组保留一张（策略：{REPRESENTATIVE}）")
     print(f"    [完成] 移除了 {count} 张视觉上高度重复的图片。")
 
 if __name__ == '__main__':
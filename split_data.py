@@ -1,8 +1,11 @@
 import os
+import re
 import shutil
 import random
 from tqdm import tqdm
 
+from daluan import MANIFEST_NAME, load_manifest
+
 # ================= 🔧 配置区域 =================
 
 # 1. 源文件夹
@@ -20,12 +23,115 @@ test_ratio = 0.1  # 10% 测试 (完全独立的考试题)
 # 如果是视频连续帧，建议选 False 以避免数据泄露；如果是散图选 True。
 random_split = True
 
-# 5. 模式: 'move' (移动) 或 'copy' (复制)
+# 5. 模式: 'move' (移动)、'copy' (复制) 或 'list' (清单)
+# 'list' 不动任何图片，只在目标文件夹写 train.txt / val.txt / test.txt 和 cow_data.yaml，
+# Ultralytics 直接按清单读图片（标签就在图片旁边的同名 .txt），重新划分只要几毫秒
 action_mode = 'move'
 
+# 6. 随机种子，固定以后每次划分结果都一样；设为 None 每次都不同
+seed = 42
+
+# 7. 按来源视频分组：同一个视频抽出来的帧整组放进同一个子集，避免相邻帧分到训练集和验证集
+# 来源从文件名里认（hebing2 合并后的 D01_20231102152806_frame_00018.jpg → D01_20231102152806）；
+# 源文件夹是 daluan.py 打乱过的（cattle000001.jpg），就按里面的 shuffle_manifest.csv 换回原名再认。
+# 视频少的时候各子集的张数会和比例差很多（只有 3 个视频就是每个子集一个视频），某个子集分不到视频会直接报错
+group_by_source = False
+
+# 8. 'list' 模式生成的 yaml 里的类别，顺序必须和标注时的 classes.txt 一致
+class_names = ['body', 'head', 'leg']
+
 
 # ===============================================
 
+def source_of_name(img_name):
+    """文件名里的来源视频：xxx_frame_00018.jpg → xxx；认不出来的就是文件名自己（单独一组）"""
+    m = re.match(r"^(.*)_frame_\d+", os.path.splitext(img_name)[0])
+    return m.group(1) if m else img_name
+
+
+def split_list(imgs, train_ratio=train_ratio, val_ratio=val_ratio, shuffle=random_split, seed=None, group_key=None):
+    """
+    把图片列表按比例切成 {'train': [...], 'val': [...], 'test': [...]}，剩下的全给测试集。
+    给了 group_key（图片名 → 组名）时按组打乱、整组分配，同一组的图片一定在同一个子集里：
+    大组先放，每一组放进离目标张数还差得最多的子集；最后还空着的子集从别的子集挪一个最小的组过来，
+    组数够的话每个比例不为 0 的子集都能分到。
+    分组后有子集是空的会抛 ValueError，张数和比例差一半以上会打印警告。
+    """
+    imgs = list(imgs)
+    train_count = int(len(imgs) * train_ratio)
+    val_count = int(len(imgs) * val_ratio)
+    subsets = {'train': [], 'val': [], 'test': []}
+
+    if group_key is None:
+        # os.listdir 的顺序随文件系统变，先排好序，同一个种子在哪台机器上切出来都一样
+        imgs.sort()
+        if shuffle:
+            random.Random(seed).shuffle(imgs)
+        subsets['train'] = imgs[:train_count]
+        subsets['val'] = imgs[train_count:train_count + val_count]
+        subsets['test'] = imgs[train_count + val_count:]
+        return subsets
+
+    by_group = {}
+    for img in sorted(imgs):
+        by_group.setdefault(group_key(img), []).append(img)
+    groups = [by_group[k] for k in sorted(by_group)]
+    if shuffle:
+        random.Random(seed).shuffle(groups)
+
+    # 目标张数（不取整）；大组先放，每一组放进离目标还差得最多的子集（一样大的组按打乱后的顺序）
+    targets = {'train': len(imgs) * train_ratio, 'val': len(imgs) * val_ratio}
+    targets['test'] = len(imgs) - targets['train'] - targets['val']
+    wanted = [name for name in subsets if targets[name] > 1e-9]
+    placed = {name: [] for name in subsets}
+    for group in sorted(groups, key=len, reverse=True):
+        name = max(wanted, key=lambda n: targets[n] - sum(map(len, placed[n])))
+        placed[name].append(group)
+    # 还空着的子集从超出目标最多的子集里拿一个最小的组
+    for name in wanted:
+        donors = [n for n in wanted if len(placed[n]) > 1]
+        if not placed[name] and donors:
+            donor = max(donors, key=lambda n: sum(map(len, placed[n])) - targets[n])
+            smallest = min(placed[donor], key=len)
+            placed[donor].remove(smallest)
+            placed[name].append(smallest)
+    for name in subsets:
+        subsets[name] = [img for group in placed[name] for img in group]
+
+    empty = [name for name in wanted if not subsets[name]]
+    if empty:
+        raise ValueError(f"按来源分组后 {', '.join(empty)} 是空的：只有 {len(groups)} 个来源，"
+                         f"不够分给 {len(wanted)} 个子集；请关掉 group_by_source 或者多加几个视频")
+    for name in wanted:
+        if abs(len(subsets[name]) - targets[name]) > 0.5 * targets[name]:
+            print(f"⚠️ 按来源分组后 {name} 有 {len(subsets[name])} 张，"
+                  f"占 {len(subsets[name]) / len(imgs):.0%}（目标 {targets[name] / len(imgs):.0%}），来源视频太少或大小差太多")
+    return subsets
+
+
+def write_split_lists(subsets, image_dir, out_dir, names=class_names):
+    """
+    写出 train.txt / val.txt / test.txt（每行一张图片的绝对路径）和 cow_data.yaml，图片原地不动。
+    返回 yaml 的路径。
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    image_dir = os.path.abspath(image_dir)
+    for subset, subset_imgs in subsets.items():
+        with open(os.path.join(out_dir, f"{subset}.txt"), "w", encoding="utf-8") as f:
+            for img_name in subset_imgs:
+                f.write(os.path.join(image_dir, img_name).replace("\\", "/") + "\n")
+
+    yaml_path = os.path.join(out_dir, "cow_data.yaml")
+    root = os.path.abspath(out_dir).replace("\\", "/")
+    with open(yaml_path, "w", encoding="utf-8") as f:
+        f.write(f"path: {root}\n")
+        for subset in subsets:
+            f.write(f"{subset}: {subset}.txt\n")
+        f.write(f"\nnc: {len(names)}\n")
+        f.write(f"names: {list(names)}\n")
+    return yaml_path
+
+
 def split_dataset():
     if not os.path.exists(source_folder):
         print(f"❌ 错误：找不到文件夹 {source_folder}")
@@ -45,21 +151,32 @@ def split_dataset():
     # 打乱或排序
     if random_split:
         print("🔀 正在随机打乱...")
-        random.shuffle(imgs)
     else:
         print("🔢 保持文件名顺序...")
-        imgs.sort()
-
-    # 计算数量
-    train_count = int(total_imgs * train_ratio)
-    val_count = int(total_imgs * val_ratio)
-    # 剩下的全给测试集，保证总数对得上
-    test_count = total_imgs - train_count - val_count
 
-    # 切分列表
-    train_imgs = imgs[:train_count]
-    val_imgs = imgs[train_count: train_count + val_count]
-    test_imgs = imgs[train_count + val_count:]
+    # 切分列表（剩下的全给测试集，保证总数对得上）
+    group_key = None
+    if group_by_source:
+        manifest_path = os.path.join(source_folder, MANIFEST_NAME)
+        original = {new: old for old, new in load_manifest(manifest_path)} if os.path.exists(manifest_path) else {}
+        group_key = lambda name: source_of_name(original.get(name, name))
+    try:
+        subsets_imgs = split_list(imgs, seed=seed, group_key=group_key)
+    except ValueError as e:
+        print(f"❌ 错误：{e}")
+        return
+    train_imgs = subsets_imgs['train']
+    val_imgs = subsets_imgs['val']
+    test_imgs = subsets_imgs['test']
+
+    if action_mode == 'list':
+        yaml_path = write_split_lists(subsets_imgs, source_folder, target_folder)
+        print(f"\n🎉 清单已生成，图片没有移动：{target_folder}")
+        print(f"训练集: {len(train_imgs)}")
+        print(f"验证集: {len(val_imgs)}")
+        print(f"测试集: {len(test_imgs)}")
+        print(f"训练时使用: {yaml_path}")
+        return
 
     # 创建目录
     subsets = ['train', 'val', 'test']